@@ -0,0 +1,4 @@
+# -*- coding: utf-8 -*-
+
+from dotted.collection import compile_getter, compile_getters, \
+    compile_setter
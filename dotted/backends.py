@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""JSON codecs used by load_json() and to_json().
+
+The standard library json module is used by default. Faster codecs are
+opt-in: set_backend('auto') selects the fastest installed one among orjson,
+ujson and simplejson. Other codecs can be registered:
+
+    register_backend('mine', mine.loads, mine.dumps)
+    set_backend('mine')
+
+Codecs may format their output differently, e.g. orjson and ujson don't add
+spaces after separators, but they never change values: orjson and ujson
+fall back to the json module for integers that don't fit in 64 bits, NaN,
+infinities and keys that are not strings.
+"""
+
+import json
+
+from collections import OrderedDict
+
+from six import binary_type
+
+
+# Backend names in order of preference for 'auto'
+PREFERENCE = ('orjson', 'ujson', 'simplejson', 'json')
+
+# Used until set_backend() is called
+DEFAULT = 'json'
+
+# Maps every digit to 0, to find integers that may not fit in 64 bits with
+# a substring search, which is much faster than a regular expression
+_DIGITS = bytes(bytearray(48 if 48 <= i < 58 else i for i in range(256)))
+_LONG_NUMBER = b'0' * 19
+
+_backends = OrderedDict()
+_current = None
+
+
+def _import_builtin(name):
+    """Returns a (loads, dumps) pair for a known codec, or None if it's not
+    installed.
+    """
+    try:
+        module = __import__(name)
+    except ImportError:
+        return None
+
+    if name == 'orjson':
+        # orjson returns bytes
+        return _guard(module.loads,
+                      lambda value: module.dumps(value).decode('utf-8'))
+    elif name == 'ujson':
+        return _guard(module.loads, module.dumps)
+
+    return module.loads, module.dumps
+
+
+def _guard(loads, dumps):
+    """Returns a (loads, dumps) pair that uses the json module for the
+    values a fast codec would change or reject.
+    """
+    def guarded_loads(value):
+        if _LONG_NUMBER not in value.encode('utf-8').translate(_DIGITS):
+            try:
+                return loads(value)
+            except ValueError:
+                pass  # NaN and infinities, or invalid JSON
+        return json.loads(value)
+
+    def guarded_dumps(value):
+        try:
+            text = dumps(value)
+        except (TypeError, ValueError, OverflowError):
+            return json.dumps(value)
+        # orjson writes NaN and infinities as null
+        if 'null' in text and _has_non_finite(value):
+            return json.dumps(value)
+        return text
+
+    return guarded_loads, guarded_dumps
+
+
+def _has_non_finite(value):
+    if isinstance(value, float):
+        return value != value or value in (float('inf'), float('-inf'))
+    elif isinstance(value, dict):
+        return any(_has_non_finite(item) for item in value.values())
+    elif isinstance(value, (list, tuple)):
+        return any(_has_non_finite(item) for item in value)
+    return False
+
+
+def register_backend(name, loads, dumps):
+    """Registers a codec. loads must raise ValueError for invalid JSON and
+    dumps must return text.
+    """
+    _backends[name] = (loads, dumps)
+
+
+def available_backends():
+    """Returns the names of the codecs that can be used"""
+    for name in PREFERENCE:
+        if name not in _backends:
+            functions = _import_builtin(name)
+            if functions is not None:
+                register_backend(name, *functions)
+    return list(_backends)
+
+
+def set_backend(name=DEFAULT):
+    """Selects the codec to use by name, the json module by default. 'auto'
+    selects the first installed codec in PREFERENCE.
+    """
+    global _current
+
+    names = available_backends()
+
+    if name == 'auto':
+        name = [backend for backend in PREFERENCE if backend in names][0]
+    elif name not in names:
+        raise ValueError('{0} is not an available JSON backend'.format(name))
+
+    _current = name
+
+
+def get_backend():
+    """Returns the name of the codec in use"""
+    if _current is None:
+        set_backend()
+    return _current
+
+
+def loads(value):
+    """Decodes a JSON string with the codec in use"""
+    if isinstance(value, binary_type):
+        value = value.decode('utf-8')
+    return _backends[get_backend()][0](value)
+
+
+def dumps(value):
+    """Encodes plain python values with the codec in use"""
+    return _backends[get_backend()][1](value)
+
+
+register_backend('json', json.loads, json.dumps)
@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+"""Micro-benchmarks for the hot paths of the dotted collections.
+
+Run them from the terminal with:
+
+    python -m dotted.benchmarks
+"""
+
+import json
+import timeit
+
+
+def measure(func, number=10000, repeat=3):
+    """Returns the best time per call of func, in seconds"""
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number
+
+
+def corpus(size):
+    """Returns a JSON string with size user records"""
+    return json.dumps([{
+        'id': i,
+        'name': 'user %d' % i,
+        'active': i % 2 == 0,
+        'address': {'street': 'main', 'number': i, 'geo': {'lat': 1.0,
+                                                           'lng': 2.0}},
+        'tags': ['a', 'b', 'c'],
+        'orders': [{'sku': 'sku-%d' % j, 'qty': j, 'price': {'amount': 10,
+                                                            'currency': 'EUR'}}
+                   for j in range(3)],
+    } for i in range(size)])
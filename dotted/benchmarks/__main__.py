@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""Runs the core benchmarks and prints the results as JSON.
+
+    python -m dotted.benchmarks --width 100 --depth 8 --escaped 0.1
+    python -m dotted.benchmarks --output baseline.json
+    python -m dotted.benchmarks --compare baseline.json --threshold 0.1
+
+With --compare each benchmark is reported with its ratio against the
+baseline and the exit status is 1 if any of them is slower than the
+threshold allows.
+"""
+
+import argparse
+import json
+import platform
+import sys
+
+from dotted import backends
+from dotted.benchmarks import core
+
+
+def compare(results, baseline, threshold):
+    """Returns a dict with the baseline, current time and ratio of every
+    benchmark in both results, and the names of the regressions.
+    """
+    comparison = {}
+    regressions = []
+
+    for name, seconds in sorted(results.items()):
+        if name not in baseline:
+            continue
+        ratio = seconds / baseline[name] if baseline[name] else 0.0
+        comparison[name] = {
+            'baseline': baseline[name],
+            'current': seconds,
+            'ratio': ratio,
+        }
+        if ratio > 1 + threshold:
+            regressions.append(name)
+
+    return comparison, regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m dotted.benchmarks',
+        description='Benchmarks the core operations of the dotted '
+                    'collections.')
+    parser.add_argument('--width', type=int, default=core.WIDTH,
+                        help='branches of the document')
+    parser.add_argument('--depth', type=int, default=core.DEPTH,
+                        help='levels of every branch')
+    parser.add_argument('--escaped', type=float, default=core.ESCAPED,
+                        help='ratio of keys with escaped dots')
+    parser.add_argument('--number', type=int, default=20,
+                        help='runs of every benchmark per repetition')
+    parser.add_argument('--output', help='also saves the results to a file')
+    parser.add_argument('--compare', metavar='BASELINE',
+                        help='compares with the results saved in a file')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='allowed slowdown ratio when comparing')
+    args = parser.parse_args(argv)
+
+    report = {
+        'params': {
+            'width': args.width,
+            'depth': args.depth,
+            'escaped': args.escaped,
+            'number': args.number,
+        },
+        'python': platform.python_version(),
+        'json_backend': backends.get_backend(),
+        'results': core.run(args.width, args.depth, args.escaped,
+                            args.number),
+    }
+
+    if args.output:
+        with open(args.output, 'w') as fp:
+            json.dump(report, fp, indent=2, sort_keys=True)
+
+    status = 0
+
+    if args.compare:
+        with open(args.compare) as fp:
+            baseline = json.load(fp)
+        if baseline.get('params') != report['params']:
+            sys.stderr.write('warning: the baseline used other params\n')
+        report['comparison'], report['regressions'] = compare(
+            report['results'], baseline['results'], args.threshold)
+        status = 1 if report['regressions'] else 0
+
+    json.dump(report, sys.stdout, indent=2, sort_keys=True)
+    sys.stdout.write('\n')
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+"""Compiled getters and setters against obj[path] and obj[path] = value"""
+
+import json
+
+from dotted.benchmarks import corpus, measure
+from dotted.collection import DottedCollection, compile_getter, \
+    compile_getters, compile_setter
+
+
+PATHS = ('id', 'address.geo.lat', 'orders.1.price.currency', 'tags.2')
+
+
+def run(number=100000):
+    plain = json.loads(corpus(1))[0]
+    obj = DottedCollection.factory(plain)
+    getters = [compile_getter(path) for path in PATHS]
+    multiple = compile_getters(PATHS)
+    setter = compile_setter('address.geo.lat')
+    results = {}
+
+    for name, target in (('dotted', obj), ('plain', plain)):
+        results[name + '_getter'] = measure(
+            lambda: [getter(target) for getter in getters], number)
+        results[name + '_getters'] = measure(
+            lambda: multiple(target), number)
+        results[name + '_setter'] = measure(
+            lambda: setter(target, 1.0), number)
+    results['dotted_getitem'] = measure(
+        lambda: [obj[path] for path in PATHS], number)
+    results['dotted_setitem'] = measure(
+        lambda: obj.__setitem__('address.geo.lat', 1.0), number)
+
+    return results
+
+
+if __name__ == '__main__':
+    for name, value in sorted(run().items()):
+        print('{0}: {1:.2e}s'.format(name, value))
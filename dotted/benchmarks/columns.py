@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+"""Extracting the same dotted keys from every record of a DottedList"""
+
+from dotted.benchmarks import corpus, measure
+from dotted.collection import DottedCollection
+
+
+SIZES = (10 ** 4, 10 ** 5)
+PATHS = ('address.geo.lat', 'orders.2.price.amount', 'name')
+
+
+def run(sizes=SIZES, number=3):
+    results = []
+
+    for size in sizes:
+        records = DottedCollection.load_json(corpus(size))
+
+        def getitem_loop():
+            return [[record[path] for record in records] for path in PATHS]
+
+        results.append({
+            'records': size,
+            'getitem_loop': measure(getitem_loop, number),
+            'column': measure(lambda: [records.column(path)
+                                       for path in PATHS], number),
+            'columns': measure(lambda: records.columns(PATHS), number),
+            'array': measure(lambda: records.column(
+                'address.geo.lat', format='array'), number),
+        })
+
+    return results
+
+
+if __name__ == '__main__':
+    for result in run():
+        print('{records:>7} records: getitem loop {getitem_loop:.4f}s, '
+              'column {column:.4f}s, columns {columns:.4f}s, single array '
+              'column {array:.4f}s'.format(**result))
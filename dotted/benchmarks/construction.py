@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""Construction of wide and deep documents. The time per node should stay
+flat as documents grow.
+"""
+
+from dotted.benchmarks import measure
+from dotted.collection import DottedCollection, is_dotted_key
+from six import iteritems
+
+
+WIDTHS = (1000, 10000, 100000)
+
+DEPTHS = (50, 100, 200)
+
+
+def wide(width):
+    """A list of width small records"""
+    return [{'id': i, 'name': 'record', 'tags': ['a', 'b']}
+            for i in range(width)]
+
+
+def deep(depth):
+    """A chain of depth nested records"""
+    value = {'id': depth}
+    for i in range(depth):
+        value = {'id': i, 'name': 'record', 'child': value}
+    return value
+
+
+def count_nodes(value):
+    if isinstance(value, dict):
+        return 1 + sum(count_nodes(item) for item in value.values())
+    elif isinstance(value, list):
+        return 1 + sum(count_nodes(item) for item in value)
+    return 1
+
+
+def validate_tree(value):
+    if isinstance(value, list):
+        for item in value:
+            validate_tree(item)
+    elif isinstance(value, dict):
+        for key, item in iteritems(value):
+            if is_dotted_key(key):
+                raise ValueError(key)
+            validate_tree(item)
+
+
+def legacy_factory(value):
+    """Mimics the constructor before validation and wrapping shared a single
+    traversal: every node validates its whole subtree before wrapping its
+    children.
+    """
+    if not isinstance(value, (dict, list)):
+        return value
+
+    validate_tree(value)
+
+    if isinstance(value, dict):
+        value = dict((key, legacy_factory(item))
+                     for key, item in iteritems(value))
+    else:
+        value = [legacy_factory(item) for item in value]
+
+    return DottedCollection.factory(value, validate=False)
+
+
+def _measure_per_node(name, size, data, number):
+    nodes = count_nodes(data)
+    return {
+        'shape': name,
+        'size': size,
+        'nodes': nodes,
+        'legacy': measure(lambda: legacy_factory(data), number) / nodes,
+        'factory': measure(lambda: DottedCollection.factory(data),
+                           number) / nodes,
+        'no_validation': measure(
+            lambda: DottedCollection.factory(data, validate=False),
+            number) / nodes,
+    }
+
+
+def run(widths=WIDTHS, depths=DEPTHS, number=3):
+    results = []
+
+    for width in widths:
+        results.append(_measure_per_node('wide', width, wide(width), number))
+
+    for depth in depths:
+        results.append(_measure_per_node('deep', depth, deep(depth), number))
+
+    return results
+
+
+if __name__ == '__main__':
+    for result in run():
+        print('{shape} {size:>6} ({nodes:>6} nodes): per node {factory:.2e}s '
+              '(legacy {legacy:.2e}s, no validation {no_validation:.2e}s)'
+              .format(**result))
@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+"""copy, deepcopy and pickle of a collection against the usual workarounds"""
+
+import copy
+import pickle
+
+from dotted.benchmarks import corpus, measure
+from dotted.collection import DottedCollection
+
+
+SIZES = (100, 1000)
+
+
+def run(sizes=SIZES, number=10):
+    results = []
+
+    for size in sizes:
+        obj = DottedCollection.load_json(corpus(size))
+
+        results.append({
+            'records': size,
+            'copy': measure(lambda: copy.copy(obj), number),
+            'deepcopy': measure(lambda: copy.deepcopy(obj), number),
+            'pickle': measure(
+                lambda: pickle.loads(pickle.dumps(obj, -1)), number),
+            # what had to be done before collections could be copied
+            'to_python_factory': measure(
+                lambda: DottedCollection.factory(obj.to_python()), number),
+            'deepcopy_to_python': measure(
+                lambda: DottedCollection.factory(
+                    copy.deepcopy(obj.to_python())), number),
+        })
+
+    return results
+
+
+if __name__ == '__main__':
+    for result in run():
+        print('{records:>5} records: copy {copy:.4f}s, deepcopy '
+              '{deepcopy:.4f}s, pickle round trip {pickle:.4f}s, '
+              'factory(to_python()) {to_python_factory:.4f}s, '
+              'factory(deepcopy(to_python())) {deepcopy_to_python:.4f}s'
+              .format(**result))
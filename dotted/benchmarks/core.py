@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""Core operations on a synthetic document of tunable shape"""
+
+from dotted.benchmarks import measure
+from dotted.collection import DottedCollection, freeze
+
+
+WIDTH = 100
+DEPTH = 8
+ESCAPED = 0.1
+
+
+def document(width=WIDTH, depth=DEPTH, escaped=ESCAPED):
+    """Returns a (plain document, leaf paths) pair. The root has width
+    branches of depth levels where dicts and single item lists alternate. A
+    ratio of escaped dict keys contain an escaped dot.
+    """
+    every = int(round(1 / escaped)) if escaped else 0
+    root = {}
+    paths = []
+
+    for branch in range(width):
+        keys = []
+        value = 'leaf'
+
+        for level in reversed(range(depth)):
+            if level % 2:
+                value = [value]
+                keys.append('0')
+            else:
+                name = 'k%d_%d' % (branch, level)
+                if every and (branch + level) % every == 0:
+                    name = name.replace('_', '\\.')
+                value = {name: value}
+                keys.append(name)
+
+        key, value = list(value.items())[0]
+        root[key] = value
+        paths.append('.'.join(reversed(keys)))
+
+    return root, paths
+
+
+def _attribute_chain(path):
+    """Returns the attribute names and list indexes of a path, or None if
+    any key can't be used as an attribute name.
+    """
+    steps = []
+    for key in path.split('.'):
+        if key.isdigit():
+            steps.append(int(key))
+        elif key.isalnum() or '_' in key and '\\' not in key:
+            steps.append(key)
+        else:
+            return None
+    return steps
+
+
+def run(width=WIDTH, depth=DEPTH, escaped=ESCAPED, number=20):
+    """Returns a dict with the seconds per operation of each benchmark"""
+    data, paths = document(width, depth, escaped)
+    missing = [path + '.missing' for path in paths]
+    obj = DottedCollection.factory(data)
+    indexed = DottedCollection.factory(data)
+    indexed.enable_index()
+    text = obj.to_json()
+    frozen = freeze(data)
+    changed = frozen.set(paths[0], 'changed')
+    chains = [chain for chain in map(_attribute_chain, paths) if chain]
+
+    def per_path(func, items=paths):
+        def loop():
+            for item in items:
+                func(item)
+        return measure(loop, number) / len(items)
+
+    def get(path):
+        return obj[path]
+
+    def set_item(path):
+        obj[path] = 'leaf'
+
+    def delete_set(path):
+        del obj[path]
+        obj[path] = 'leaf'
+
+    def indexed_get(path):
+        return indexed[path]
+
+    def indexed_set(path):
+        indexed[path] = 'leaf'
+
+    def contains(path):
+        return path in obj
+
+    def attributes(chain):
+        node = obj
+        for step in chain:
+            node = node[step] if isinstance(step, int) \
+                else getattr(node, step)
+        return node
+
+    def cached_to_python():
+        # only the root copy is rebuilt
+        object.__setattr__(obj, '_plain', None)
+        return obj.to_python(copy=False)
+
+    results = {
+        'construction': measure(
+            lambda: DottedCollection.factory(data), number),
+        'construction_lazy': measure(
+            lambda: DottedCollection.factory(data, lazy=True), number),
+        'construction_unvalidated': measure(
+            lambda: DottedCollection.factory(data, validate=False), number),
+        'get': per_path(get),
+        'set': per_path(set_item),
+        'delete_set': per_path(delete_set),
+        'indexed_get': per_path(indexed_get),
+        'indexed_set': per_path(indexed_set),
+        'index': measure(
+            lambda: (indexed.disable_index(), indexed.enable_index()), number),
+        'contains': per_path(contains),
+        'contains_missing': per_path(contains, missing),
+        'to_python': measure(obj.to_python, number),
+        'to_python_cached': measure(cached_to_python, number),
+        'to_json': measure(obj.to_json, number),
+        'diff': measure(lambda: obj.diff(DottedCollection.factory(data)),
+                        number),
+        'diff_shared': measure(lambda: frozen.diff(changed), number),
+        'load_json': measure(
+            lambda: DottedCollection.load_json(text), number),
+    }
+
+    if chains:
+        results['attribute_access'] = per_path(attributes, chains)
+
+    return results
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""Conversions between nested documents and flat dotted key dicts"""
+
+import time
+
+from dotted.collection import DottedCollection, DottedDict
+
+
+LEAVES = (10 ** 5, 10 ** 6)
+
+
+def flat_document(leaves):
+    """Returns a flat dict with the given number of leaves, grouped in
+    records of ten values with a nested list.
+    """
+    flat = {}
+    for i in range(leaves // 10):
+        prefix = 'records.%d.' % i
+        for j in range(5):
+            flat[prefix + 'field%d' % j] = j
+        for j in range(5):
+            flat[prefix + 'values.%d' % j] = j
+    return flat
+
+
+def timed(func):
+    """Returns the seconds taken by a single call of func"""
+    start = time.time()
+    func()
+    return time.time() - start
+
+
+def run(leaves=LEAVES):
+    results = []
+
+    for size in leaves:
+        flat = flat_document(size)
+        # records and values must be set in order
+        items = sorted(flat.items(), key=lambda item: [
+            int(key) if key.isdigit() else key
+            for key in item[0].split('.')])
+        obj = DottedDict.from_flat(items)
+
+        def setitem_loop():
+            obj = DottedDict()
+            for key, value in items:
+                obj[key] = value
+
+        results.append({
+            'leaves': size,
+            'from_flat': timed(lambda: DottedDict.from_flat(items)),
+            'setitem_loop': timed(setitem_loop),
+            'flatten': timed(obj.flatten),
+            'iterflatten': timed(lambda: sum(1 for _ in obj.iterflatten())),
+            'factory': timed(lambda: DottedCollection.factory(
+                obj.to_python())),
+        })
+
+    return results
+
+
+if __name__ == '__main__':
+    for result in run():
+        print('{leaves:>8} leaves: from_flat {from_flat:.2f}s (setitem loop '
+              '{setitem_loop:.2f}s), flatten {flatten:.2f}s, iterflatten '
+              '{iterflatten:.2f}s'.format(**result))
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""Reading and writing JSON Lines against a dot_json() call per line"""
+
+import io
+import json
+
+from dotted.benchmarks import corpus, measure
+from dotted.streaming import dump_lines, iter_lines
+from dotted.utils import dot_json
+
+
+SIZES = (1000, 10000)
+
+
+def run(sizes=SIZES, number=5):
+    results = []
+
+    for size in sizes:
+        records = json.loads(corpus(size))
+        data = ''.join(json.dumps(record) + '\n'
+                       for record in records).encode('utf-8')
+        objs = list(iter_lines(data))
+
+        def filter_lines(lazy):
+            # reads one field of every record
+            return sum(record['address']['number']
+                       for record in iter_lines(io.BytesIO(data), lazy=lazy))
+
+        def write_per_line():
+            target = io.BytesIO()
+            for obj in objs:
+                target.write((obj.to_json() + '\n').encode('utf-8'))
+
+        results.append({
+            'records': size,
+            'per_line': measure(
+                lambda: [dot_json(line) for line in io.BytesIO(data)],
+                number),
+            'iter_lines': measure(
+                lambda: list(iter_lines(io.BytesIO(data))), number),
+            'filter': measure(lambda: filter_lines(False), number),
+            'filter_lazy': measure(lambda: filter_lines(True), number),
+            'write_per_line': measure(write_per_line, number),
+            'dump_lines': measure(
+                lambda: dump_lines(objs, io.BytesIO()), number),
+        })
+
+    return results
+
+
+if __name__ == '__main__':
+    for result in run():
+        print('{records:>5} records: dot_json per line {per_line:.4f}s, '
+              'iter_lines {iter_lines:.4f}s, filter {filter:.4f}s, lazy '
+              'filter {filter_lazy:.4f}s, to_json per line '
+              '{write_per_line:.4f}s, dump_lines {dump_lines:.4f}s'
+              .format(**result))
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""Memory used by the wrappers of a realistic nested JSON corpus, compared
+with nodes that carry an instance __dict__ like before nodes were slotted.
+Python 3 only: nodes still have a __dict__ on Python 2, and tracemalloc is
+missing there.
+"""
+
+import gc
+import json
+import tracemalloc
+
+from dotted.benchmarks import corpus
+from dotted.collection import DottedCollection, DottedDict, DottedList
+
+
+SIZES = (1000, 10000)
+
+
+class UnslottedDottedDict(DottedDict):
+    """A DottedDict with an instance __dict__"""
+
+
+class UnslottedDottedList(DottedList):
+    """A DottedList with an instance __dict__"""
+
+
+def count_nodes(obj):
+    values = obj.store.values() if isinstance(obj, DottedDict) else obj.store
+    return 1 + sum(count_nodes(value) for value in values
+                   if isinstance(value, DottedCollection))
+
+
+def unslotted(obj):
+    """Returns a copy of the wrapper tree made of unslotted nodes"""
+    if isinstance(obj, DottedDict):
+        node = object.__new__(UnslottedDottedDict)
+        store = dict((key, unslotted(value))
+                     for key, value in obj.store.items())
+    elif isinstance(obj, DottedList):
+        node = object.__new__(UnslottedDottedList)
+        store = [unslotted(value) for value in obj.store]
+    else:
+        return obj
+
+    object.__setattr__(node, 'store', store)
+    object.__setattr__(node, '_lazy', False)
+    # instances get their __dict__ when the first attribute is written
+    node.__dict__['_unused'] = None
+    del node.__dict__['_unused']
+    return node
+
+
+def allocated(func):
+    """Returns the result of func and the bytes it allocated"""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        result = func()
+        size = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    return result, size
+
+
+def run(sizes=SIZES):
+    results = []
+
+    for size in sizes:
+        data = corpus(size)
+        plain, plain_size = allocated(lambda: json.loads(data))
+        obj, size_after = allocated(lambda: DottedCollection.factory(plain))
+        copy, size_before = allocated(lambda: unslotted(obj))
+        nodes = count_nodes(obj)
+
+        results.append({
+            'records': size,
+            'nodes': nodes,
+            'plain_bytes_per_node': plain_size / float(nodes),
+            'bytes_per_node_before': size_before / float(nodes),
+            'bytes_per_node': size_after / float(nodes),
+        })
+
+    return results
+
+
+if __name__ == '__main__':
+    for result in run():
+        print('{records:>6} records ({nodes:>7} nodes): {bytes_per_node:.1f} '
+              'bytes per node (before {bytes_per_node_before:.1f}, plain JSON '
+              '{plain_bytes_per_node:.1f})'.format(**result))
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+"""Layering several config sources into one DottedDict"""
+
+from dotted.benchmarks import measure
+from dotted.collection import DottedDict
+
+
+SOURCES = 8
+SECTIONS = 50
+
+
+def sources(count=SOURCES, sections=SECTIONS):
+    """Returns count plain configs that override some keys of the first"""
+    return [dict(
+        ('section%d' % section, {
+            'enabled': layer % 2 == 0,
+            'limits': {'max': layer * section, 'min': 0},
+            'hosts': ['host%d' % layer],
+        })
+        for section in range(sections) if layer == 0 or section % count == layer
+    ) for layer in range(count)]
+
+
+def naive_merge(obj, source):
+    """The usual recursive merge through __getitem__ and __setitem__"""
+    for key, value in source.items():
+        if isinstance(value, dict) and key in obj \
+                and isinstance(obj[key], DottedDict):
+            naive_merge(obj[key], value)
+        else:
+            obj[key] = value
+
+
+def run(count=SOURCES, sections=SECTIONS, number=200):
+    layers = sources(count, sections)
+
+    def deep_merge():
+        obj = DottedDict()
+        for layer in layers:
+            obj.deep_merge(layer)
+
+    def naive():
+        obj = DottedDict()
+        for layer in layers:
+            naive_merge(obj, layer)
+
+    def flat():
+        obj = DottedDict()
+        for layer in layers:
+            obj.set_many(DottedDict(layer).flatten())
+
+    return {
+        'deep_merge': measure(deep_merge, number),
+        'naive_merge': measure(naive, number),
+        'set_many_flatten': measure(flat, number),
+    }
+
+
+if __name__ == '__main__':
+    print('{0} sources: deep_merge {deep_merge:.6f}s, naive merge '
+          '{naive_merge:.6f}s, set_many of flatten() '
+          '{set_many_flatten:.6f}s'.format(SOURCES, **run()))
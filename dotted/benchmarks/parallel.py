@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+"""load_many() and dump_many() against parsing and serializing in a loop"""
+
+import json
+
+from dotted.benchmarks import corpus, measure
+from dotted.parallel import dump_many, load_many
+from dotted.utils import dot_json
+
+
+SIZE = 20000
+
+
+def run(size=SIZE, workers=(2, 4), number=1):
+    lines = [json.dumps(record) for record in json.loads(corpus(size))]
+    objs = [dot_json(line) for line in lines]
+
+    result = {
+        'records': size,
+        'load_loop': measure(lambda: [dot_json(line) for line in lines],
+                             number),
+        'dump_loop': measure(lambda: [obj.to_json() for obj in objs],
+                             number),
+    }
+    for count in workers:
+        result['load_many_%d' % count] = measure(
+            lambda: list(load_many(lines, workers=count)), number)
+        result['load_many_lazy_%d' % count] = measure(
+            lambda: list(load_many(lines, lazy=True, workers=count)), number)
+        result['dump_many_%d' % count] = measure(
+            lambda: list(dump_many(objs, workers=count)), number)
+
+    return result
+
+
+if __name__ == '__main__':
+    for key, value in sorted(run().items()):
+        print('{0}: {1}'.format(key, value if key == 'records'
+                                else '{0:.4f}s'.format(value)))
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+"""Parsing and serialization with every available JSON backend"""
+
+import json
+
+from dotted import backends
+from dotted.benchmarks import corpus, measure
+from dotted.collection import DottedCollection, DottedJSONEncoder
+
+
+SIZE = 1000
+
+
+def run(size=SIZE, number=20):
+    text = corpus(size)
+    obj = DottedCollection.load_json(text)
+    plain = obj.to_python()
+    results = []
+
+    previous = backends.get_backend()
+    try:
+        for name in backends.available_backends():
+            backends.set_backend(name)
+            obj.to_json()  # warms the cached plain copy
+
+            results.append({
+                'backend': name,
+                'loads': measure(lambda: backends.loads(text), number),
+                'load_json': measure(
+                    lambda: DottedCollection.load_json(text), number),
+                'dumps': measure(lambda: backends.dumps(plain), number),
+                'to_json': measure(obj.to_json, number),
+                'to_json_uncached': measure(
+                    lambda: backends.dumps(obj.to_python()), number),
+            })
+    finally:
+        backends.set_backend(previous)
+
+    # Serialization before the backends, through a per node callback
+    results.append({
+        'backend': 'json (DottedJSONEncoder)',
+        'to_json': measure(
+            lambda: json.dumps(obj, cls=DottedJSONEncoder), number),
+    })
+
+    return results
+
+
+if __name__ == '__main__':
+    for result in run():
+        print(', '.join(
+            '{0} {1}'.format(key, value if key == 'backend'
+                             else '{0:.2e}s'.format(value))
+            for key, value in sorted(result.items())))
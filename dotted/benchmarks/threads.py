@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""Read throughput of a shared config with N reader threads and a writer"""
+
+import threading
+import time
+
+from dotted.collection import DottedDict
+from dotted.threadsafe import ConcurrentDottedDict
+
+
+READERS = (1, 4, 8)
+DURATION = 1.0
+DATA = {'db': {'hosts': [{'name': 'a', 'port': 1}]}, 'flags': {'x': True}}
+
+
+class LockedDottedDict(object):
+    """A DottedDict guarded by a lock, the usual alternative"""
+
+    def __init__(self, initial):
+        self.obj = DottedDict(initial)
+        self.lock = threading.Lock()
+
+    def __getitem__(self, key):
+        with self.lock:
+            return self.obj[key]
+
+    def set_many(self, items):
+        with self.lock:
+            self.obj.set_many(items)
+
+
+def throughput(obj, readers, duration=DURATION):
+    """Returns the reads per second of all the readers together while a
+    writer updates obj continuously.
+    """
+    done = threading.Event()
+    counts = [0] * readers
+
+    def read(position):
+        count = 0
+        while not done.is_set():
+            for _ in range(100):
+                obj['db.hosts.0.port']
+            count += 100
+        counts[position] = count
+
+    def write():
+        i = 0
+        while not done.is_set():
+            i += 1
+            obj.set_many([('db.hosts.0.port', i), ('flags.x', i % 2 == 0)])
+            time.sleep(0.001)
+
+    threads = [threading.Thread(target=read, args=(i, ))
+               for i in range(readers)]
+    threads.append(threading.Thread(target=write))
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    done.set()
+    for thread in threads:
+        thread.join()
+
+    return sum(counts) / duration
+
+
+def run(readers=READERS, duration=DURATION):
+    return [{
+        'readers': count,
+        'concurrent': throughput(ConcurrentDottedDict(DATA), count, duration),
+        'locked': throughput(LockedDottedDict(DATA), count, duration),
+    } for count in readers]
+
+
+if __name__ == '__main__':
+    for result in run():
+        print('{readers:>2} readers: {concurrent:,.0f} reads/s lock-free, '
+              '{locked:,.0f} reads/s with a lock'.format(**result))
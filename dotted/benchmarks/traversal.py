@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""Deep get/set/delete/contains against a recursive re-splitting traversal"""
+
+from dotted.benchmarks import measure
+from dotted.collection import DottedCollection, DottedList, is_dotted_key, \
+    split_key
+
+
+DEPTHS = (2, 8, 32)
+
+
+def build(depth):
+    """Returns a (DottedCollection, dotted key) pair where the key reaches a
+    leaf at the given depth. Dicts and lists alternate along the path.
+    """
+    keys = []
+    value = 'leaf'
+
+    for level in reversed(range(depth)):
+        if level % 2:
+            value = [value]
+            keys.append('0')
+        else:
+            value = {'key%d' % level: value}
+            keys.append('key%d' % level)
+
+    return DottedCollection.factory(value), '.'.join(reversed(keys))
+
+
+def recursive_get(obj, key):
+    """The traversal used before paths were walked in a single pass: split
+    off one key and recurse with the rest of the string.
+    """
+    if not is_dotted_key(key):
+        return obj.store[int(key) if isinstance(obj, DottedList) else key]
+
+    my_key, alt_key = split_key(key, 1)
+    target = obj.store[int(my_key) if isinstance(obj, DottedList) else my_key]
+    return recursive_get(target, alt_key)
+
+
+def run(depths=DEPTHS, number=10000):
+    results = []
+
+    for depth in depths:
+        obj, key = build(depth)
+        parent_key, leaf_key = key.rsplit('.', 1)
+
+        def set_delete():
+            obj[key] = 'leaf'
+            del obj[key]
+            obj[key] = 'leaf'
+
+        results.append({
+            'depth': depth,
+            'recursive_get': measure(lambda: recursive_get(obj, key), number),
+            'get': measure(lambda: obj[key], number),
+            'contains': measure(lambda: key in obj, number),
+            'set_delete': measure(set_delete, number),
+        })
+
+    return results
+
+
+if __name__ == '__main__':
+    for result in run():
+        print('depth {depth:>3}: get {get:.2e}s (recursive {recursive_get:.2e}'
+              's), contains {contains:.2e}s, set+delete+set '
+              '{set_delete:.2e}s'.format(**result))
@@ -1,24 +1,66 @@
 # -*- coding: utf-8 -*-
 
+import array
 import collections
+import copy
+import itertools
 import json
 import re
 
 from abc import ABCMeta, abstractmethod
 
-from six import add_metaclass, string_types as basestring, iteritems
+from six import add_metaclass, integer_types, string_types as basestring, \
+    iteritems
+
+from dotted import backends
 
 
 SPLIT_REGEX = r"(?<!\\)(\.)"
 
+SPLIT_PATTERN = re.compile(SPLIT_REGEX)
+
+# Default number of parsed paths kept by parse_key()
+PATH_CACHE_SIZE = 1024
+
+# Number of compiled patterns kept by compile_query()
+QUERY_CACHE_SIZE = 256
+
+# Number of generated functions kept by compile_getter() and compile_setter()
+ACCESSOR_CACHE_SIZE = 256
+
+# How deep_merge() combines two lists
+LIST_STRATEGIES = ('replace', 'append', 'merge')
+
+# Marks arguments that were not provided
+_MISSING = object()
+
+
+# Typecode of integer array columns: 'q' is missing on Python 2
+try:
+    array.array('q')
+    _INT_TYPECODE = 'q'
+except ValueError:
+    _INT_TYPECODE = 'l'
+
+# Leaf values that deep copies can share
+_ATOMIC = (type(None), bool, float, complex, bytes, basestring) + \
+    integer_types
+
+
+class DottedKeyError(KeyError, AttributeError):
+    """Raised for a missing attribute of a DottedDict. It's a KeyError like
+    any missing key and an AttributeError so getattr(), hasattr() and the
+    copy and pickle modules work as usual.
+    """
+
 
 def is_dotted_key(key):
     """Returns True if the key has any not-escaped dot inside"""
-    return len(re.findall(SPLIT_REGEX, key)) > 0
+    return SPLIT_PATTERN.search(key) is not None
 
 
 def split_key(key, max_keys=0):
-    """Splits a key but allows dots in the key name if they're escaped properly.
+    r"""Splits a key but allows dots in the key name if they're escaped properly.
 
     Splitting this complex key:
 
@@ -38,66 +80,232 @@ def split_key(key, max_keys=0):
     Returns:
         A list of keys
     """
-    parts = [x for x in re.split(SPLIT_REGEX, key) if x != "."]
-    result = []
-    while len(parts) > 0:
-        if max_keys > 0 and len(result) == max_keys:
-            break
-        result.append(parts.pop(0))
-
-    if len(parts) > 0:
-        result.append(".".join(parts))
-    return result
+    # The regex has a capturing group so separators are at odd positions
+    parts = SPLIT_PATTERN.split(key)[::2]
+
+    if 0 < max_keys < len(parts):
+        return parts[:max_keys] + [".".join(parts[max_keys:])]
+    return parts
+
+
+class _LRUCache(object):
+    """A minimal bounded mapping that discards the least recently used entry
+    when it gets full. A maxsize of 0 disables the cache.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def get(self, key, default=None):
+        try:
+            value = self._data.pop(key)
+        except KeyError:
+            return default
+        self._data[key] = value
+        return value
+
+    def set(self, key, value):
+        if self.maxsize <= 0:
+            return
+        self._data.pop(key, None)
+        self._data[key] = value
+        while len(self._data) > self.maxsize:
+            try:
+                self._data.popitem(last=False)
+            except KeyError:  # emptied by another thread
+                break
+
+    def resize(self, maxsize):
+        self.maxsize = maxsize
+        while len(self._data) > max(maxsize, 0):
+            self._data.popitem(last=False)
+
+    def clear(self):
+        self._data.clear()
+
+
+class DottedPath(object):
+    r"""A dotted key tokenized once. It can be used anywhere a string key is
+    accepted to skip parsing the key on every access.
+
+    Parts are kept exactly as they appear in the key, so escaped dots remain
+    escaped and match the keys stored inside a DottedCollection:
+
+    DottedPath("facets.d\.o\. origen.0").parts
+
+    results in:
+
+    ('facets', 'd\.o\. origen', '0')
+    """
+
+    __slots__ = ('key', 'parts')
+
+    def __init__(self, key):
+        if isinstance(key, DottedPath):
+            self.key, self.parts = key.key, key.parts
+        else:
+            self.key = key
+            self.parts = tuple(split_key(key))
+
+    @classmethod
+    def from_parts(cls, parts):
+        """Returns a DottedPath from a sequence of already splitted keys"""
+        path = cls.__new__(cls)
+        path.parts = tuple(
+            part if isinstance(part, basestring) else str(part)
+            for part in parts
+        )
+        path.key = ".".join(path.parts)
+        return path
+
+    @property
+    def head(self):
+        """The first key of the path"""
+        return self.parts[0]
+
+    @property
+    def tail(self):
+        """A DottedPath with all the keys but the first one"""
+        return DottedPath.from_parts(self.parts[1:])
+
+    def __len__(self):
+        return len(self.parts)
+
+    def __iter__(self):
+        return iter(self.parts)
+
+    def __eq__(self, other):
+        if isinstance(other, DottedPath):
+            return self.parts == other.parts
+        if isinstance(other, basestring):
+            return self.key == other
+        return NotImplemented
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    def __hash__(self):
+        return hash(self.key)
+
+    def __str__(self):
+        return self.key
+
+    def __repr__(self):
+        return "DottedPath(%r)" % (self.key, )
+
+
+_path_cache = _LRUCache(PATH_CACHE_SIZE)
+
+
+def parse_key(key):
+    """Returns the DottedPath for a key. Parsed string keys are kept in a
+    bounded LRU cache so repeated lookups of the same key skip the regex.
+    """
+    if isinstance(key, DottedPath):
+        return key
+
+    path = _path_cache.get(key)
+    if path is None:
+        path = DottedPath(key)
+        _path_cache.set(key, path)
+    return path
+
+
+def set_path_cache_size(size):
+    """Sets the maximum number of parsed keys kept by parse_key(). Use 0 to
+    disable the cache.
+    """
+    _path_cache.resize(size)
+
+
+def clear_path_cache():
+    """Discards every parsed key kept by parse_key()"""
+    _path_cache.clear()
+
 
 
 @add_metaclass(ABCMeta)
 class DottedCollection(object):
     """Abstract Base Class for DottedDict and DottedDict"""
 
+    # Nodes have no instance __dict__ to keep big documents small, except on
+    # Python 2, where the collections ABCs have no __slots__. Lazy
+    # collections (_lazy) keep nested dicts and lists unwrapped until they
+    # are accessed for the first time. _parent is the collection holding
+    # this one and _plain caches the result of to_python(copy=False).
+    # _index is the _LeafIndex shared by every node of an indexed or
+    # tracked tree. _validate tells whether the nested values of a lazy
+    # collection are validated when they are wrapped.
+    __slots__ = ('store', '_lazy', '_parent', '_plain', '_index', '_validate')
+
     @classmethod
-    def factory(cls, initial=None):
+    def factory(cls, initial=None, lazy=False, validate=True):
         """Returns a DottedDict or a DottedList based on the type of the
         initial value, that must be a dict or a list. In other case the same
         original value will be returned.
+
+        If lazy is True nested dicts and lists are wrapped on first access
+        instead of when the collection is created. If validate is False keys
+        are not checked, which is only safe for trusted data.
         """
         if isinstance(initial, list):
-            return DottedList(initial)
+            return DottedList(initial, lazy=lazy, validate=validate)
         elif isinstance(initial, dict):
-            return DottedDict(initial)
+            return DottedDict(initial, lazy=lazy, validate=validate)
         else:
             return initial
 
     @classmethod
-    def load_json(cls, json_value):
+    def load_json(cls, json_value, lazy=False, validate=True):
         """Returns a DottedCollection from a JSON string"""
-        return cls.factory(json.loads(json_value))
+        return cls.factory(backends.loads(json_value), lazy=lazy,
+                           validate=validate)
 
     @classmethod
-    def _factory_by_index(cls, dotted_key):
+    def _factory_by_index(cls, dotted_key, lazy=False):
         """Returns the proper DottedCollection that best suits the next key in
         the dotted_key string. First guesses the next key and then analyzes it.
         If the next key is numeric then returns a DottedList. In other case a
         DottedDict is returned.
         """
-        if not isinstance(dotted_key, basestring):
+        if not isinstance(dotted_key, (basestring, DottedPath)):
             next_key = str(dotted_key)
-        elif not is_dotted_key(dotted_key):
-            next_key = dotted_key
         else:
-            next_key, tmp = split_key(dotted_key, 1)
+            next_key = parse_key(dotted_key).head
 
-        return DottedCollection.factory([] if next_key.isdigit() else {})
+        return DottedCollection.factory([] if next_key.isdigit() else {},
+                                        lazy=lazy)
 
-    def __init__(self, initial):
+    def __init__(self, initial, lazy=False, validate=True):
         """Base constructor. If there are nested dicts or lists they are
-        transformed into DottedCollection instances.
+        transformed into DottedCollection instances, unless lazy is True.
+        Lazy collections wrap nested values the first time they are
+        accessed, so invalid nested keys are reported at that moment.
+
+        Each level validates its own keys before wrapping its children, so
+        the whole tree is validated and wrapped in a single traversal. Use
+        validate=False to skip validation for trusted data.
         """
         if not isinstance(initial, list) and not isinstance(initial, dict):
             raise ValueError('initial value must be a list or a dict')
 
-        self._validate_initial(initial)
+        if validate:
+            self._validate_initial(initial, deep=False)
 
         self.store = initial
+        object.__setattr__(self, '_lazy', lazy)
+        object.__setattr__(self, '_parent', None)
+        object.__setattr__(self, '_plain', None)
+        object.__setattr__(self, '_index', None)
+        object.__setattr__(self, '_validate', validate)
 
         if isinstance(self.store, list):
             data = enumerate(self.store)
@@ -105,22 +313,554 @@ class DottedCollection(object):
             data = iteritems(self.store)
 
         for key, value in data:
-            try:
-                self.store[key] = DottedCollection.factory(value)
-            except ValueError:
-                pass
+            if isinstance(value, (dict, list)):
+                if not lazy:
+                    self.store[key] = self._adopt(DottedCollection.factory(
+                        value, validate=validate))
+            elif isinstance(value, DottedCollection):
+                self.store[key] = self._adopt(value)
 
-    def _validate_initial(self, initial):
-        """Validates data so no unescaped dotted key is present."""
+    @classmethod
+    def from_flat(cls, items, lazy=False):
+        """Returns a new collection from a mapping or an iterable of
+        (dotted key, value) pairs, like the ones returned by flatten(). Every
+        intermediate node is created once, as __setitem__ would do, and list
+        items must be given in order.
+        """
+        root = cls(lazy=lazy)
+        nodes = {(): root}
+
+        for key, value in iteritems(items) if hasattr(items, 'keys') \
+                else items:
+            parts = _flat_parts(key)
+            root._walk_cached(nodes, parts, 'set', create=True)._set_key(
+                parts[-1], value)
+            if parts in nodes:
+                # the node was replaced
+                _forget(nodes, parts)
+
+        return root
+
+    def _validate_initial(self, initial, deep=True):
+        """Validates data so no unescaped dotted key is present. If deep is
+        False nested values are not validated.
+        """
         if isinstance(initial, list):
-            for item in initial:
-                self._validate_initial(item)
+            if deep:
+                for item in initial:
+                    self._validate_initial(item)
         elif isinstance(initial, dict):
             for key, item in iteritems(initial):
-                if is_dotted_key(key):
+                # the substring test avoids the regex for most keys
+                if "." in key and is_dotted_key(key):
                     raise ValueError("{0} is not a valid key inside a "
                                      "DottedCollection!".format(key))
-                self._validate_initial(item)
+                if deep:
+                    self._validate_initial(item)
+
+    def _lazy_value(self, key, value):
+        """Wraps a nested dict or list of a lazy collection and keeps the
+        wrapper in place of the original value.
+        """
+        if self._lazy and isinstance(value, (dict, list)):
+            wrapper = self._adopt(self._wrap(value))
+            # the original value is still a valid plain copy of the wrapper
+            object.__setattr__(wrapper, '_plain', value)
+            self.store[key] = value = wrapper
+            if self._index is not None:
+                if isinstance(self.store, list):
+                    # indexed paths use non-negative indexes
+                    key = range(len(self.store))[key]
+                self._index_items([key], changed=False)
+        return value
+
+    def _wrap(self, value):
+        """Returns the lazy collection wrapping a nested value"""
+        return DottedCollection.factory(value, lazy=True,
+                                        validate=self._validate)
+
+    def _adopt(self, value):
+        """Makes this collection the parent of value if it's a
+        DottedCollection. Returns the value, or a copy of it if it's already
+        inside another collection: a node has a single parent, so the plain
+        copies and the index of the trees holding it can't get stale.
+        Frozen collections never change, so they are shared.
+        """
+        if isinstance(value, DottedCollection) \
+                and not isinstance(value, _Frozen):
+            if value._parent is not None or value._index is not None:
+                value = value.__deepcopy__({})
+            object.__setattr__(value, '_parent', self)
+        return value
+
+    def _changed(self):
+        """Must be called after modifying the store. Drops the plain copies
+        cached by this collection and its ancestors.
+        """
+        node = self
+        # a node without a cached copy has no ancestor with a cached copy
+        while node is not None and node._plain is not None:
+            object.__setattr__(node, '_plain', None)
+            node = node._parent
+
+    def _export(self, cache=False):
+        """Returns a plain copy of this collection. Nested dicts and lists
+        not yet wrapped and the copies cached by to_python(copy=False) are
+        shared. If cache is True the copies built are cached too, otherwise
+        they are only kept by the caller.
+        """
+        plain = self._plain
+
+        if plain is None:
+            if isinstance(self.store, list):
+                plain = [
+                    value._export(cache)
+                    if isinstance(value, DottedCollection) else value
+                    for value in self.store
+                ]
+            else:
+                plain = dict(
+                    (key, value._export(cache)
+                     if isinstance(value, DottedCollection) else value)
+                    for key, value in iteritems(self.store)
+                )
+            if cache:
+                object.__setattr__(self, '_plain', plain)
+
+        return plain
+
+    def enable_index(self):
+        """Keeps every value of this collection in a dict by its full dotted
+        path, so getting a deep key is a single lookup. Writes update the
+        entries of the modified subtree, which makes them slower.
+        """
+        self._paths(values=True)
+
+    def disable_index(self):
+        """Discards the index built by enable_index()"""
+        if self._index is not None:
+            self._index.values = None
+            self._release_paths()
+
+    def enable_tracking(self):
+        """Records the dotted keys modified from now on. See
+        collect_changes().
+        """
+        index = self._paths()
+        if index.changes is None:
+            index.changes = set()
+
+    def disable_tracking(self):
+        """Stops recording modified keys and discards the recorded ones"""
+        if self._index is not None:
+            self._index.changes = None
+            self._release_paths()
+
+    def collect_changes(self):
+        """Returns the sorted dotted keys set, deleted or created by a write
+        since tracking was enabled or clear_changes() was called, relative to
+        the collection where tracking or the index was enabled first. Keys
+        inside another changed key are left out, and keys that no longer
+        exist were deleted.
+        """
+        if self._index is None or self._index.changes is None:
+            return []
+
+        kept = set()
+        for parts in sorted(map(_flat_parts, self._index.changes), key=len):
+            if not any(parts[:i] in kept for i in range(1, len(parts))):
+                kept.add(parts)
+        return sorted(".".join(parts) for parts in kept)
+
+    def clear_changes(self):
+        """Forgets the keys recorded since tracking was enabled"""
+        if self._index is not None and self._index.changes is not None:
+            self._index.changes.clear()
+
+    def _paths(self, values=False):
+        """Returns the _LeafIndex of this tree, creating it if needed. If
+        values is True every value is added to it too.
+        """
+        index = self._index
+        if index is None:
+            index = _LeafIndex()
+            object.__setattr__(self, '_index', index)
+            index.prefixes[id(self)] = ''
+        elif not values or index.values is not None:
+            return index
+
+        if values:
+            index.values = {}
+        self._index_items(self._keys(), changed=False)
+        return index
+
+    def _release_paths(self):
+        """Discards the _LeafIndex of this tree if it's no longer used"""
+        if self._index.values is None and self._index.changes is None:
+            self._unindex_items(self._keys(), changed=False)
+            object.__setattr__(self, '_index', None)
+
+    def _keys(self):
+        if isinstance(self.store, list):
+            return range(len(self.store))
+        return list(self.store)
+
+    def _index_items(self, keys, changed=True):
+        """Adds the given keys of the store and their descendants to the
+        index. Must be called after they're set. If changed is True the keys
+        are recorded as changes.
+        """
+        index = self._index
+        prefix = index.prefixes[id(self)]
+        for key in keys:
+            path = prefix + str(key)
+            _index_tree(index, path, self.store[key])
+            if changed and index.changes is not None:
+                index.changes.add(path)
+
+    def _unindex_items(self, keys, changed=True):
+        """Removes the given keys of the store and their descendants from the
+        index. Must be called before they're replaced or deleted. If changed
+        is True the keys are recorded as changes.
+        """
+        index = self._index
+        prefix = index.prefixes[id(self)]
+        for key in keys:
+            path = prefix + str(key)
+            _unindex_tree(index, path, self.store[key])
+            if changed and index.changes is not None:
+                index.changes.add(path)
+
+    def _child(self, parts, i, action, create=False):
+        """Returns the DottedCollection stored in parts[i], that must be the
+        next step of a dotted path. parts[i + 1:] is the rest of the path.
+
+        If create is True and the key does not exist a new node is created
+        with _factory_by_index().
+        """
+        key = parts[i]
+        store = self.store
+
+        if isinstance(store, list):
+            if not _is_index(key):
+                raise IndexError('cannot {0} "{1}" in {2}'.format(
+                    action, ".".join(parts[i:]), repr(store)))
+            key = int(key)
+            if create and key == len(store):
+                store.append(self._adopt(DottedCollection._factory_by_index(
+                    parts[i + 1], lazy=self._lazy)))
+                self._changed()
+                if self._index is not None:
+                    self._index_items([key])
+            target = store[key]
+            error = IndexError
+        else:
+            if create and key not in store:
+                store[key] = self._adopt(DottedCollection._factory_by_index(
+                    parts[i + 1], lazy=self._lazy))
+                self._changed()
+                if self._index is not None:
+                    self._index_items([key])
+            target = store[key]
+            error = KeyError
+
+        if self._lazy:
+            target = self._lazy_value(key, target)
+
+        # required by the dotted path
+        if not isinstance(target, DottedCollection):
+            raise error('cannot {0} "{1}" in "{2}" ({3})'.format(
+                action,
+                ".".join(parts[i + 1:]),
+                parts[i],
+                repr(target)
+            ))
+
+        return target
+
+    def _walk(self, parts, action, create=False):
+        """Descends through the nested stores following all the keys in
+        parts but the last one. Returns the DottedCollection that holds the
+        last key.
+
+        If create is True missing intermediate nodes are created with
+        _factory_by_index() so the whole path can be set.
+        """
+        node = self
+
+        for i in range(len(parts) - 1):
+            node = node._child(parts, i, action, create)
+
+        return node
+
+    def _walk_cached(self, nodes, parts, action, create=False):
+        """Like _walk(), but starting from the longest prefix of parts found
+        in nodes, a dict of nodes by their tuple of parts. The nodes found on
+        the way are added to it.
+        """
+        prefix = parts[:-1]
+        node = nodes.get(prefix)
+
+        if node is None:
+            end = len(prefix) - 1
+            while prefix[:end] not in nodes:
+                end -= 1
+            node = nodes[prefix[:end]]
+            for i in range(end, len(prefix)):
+                node = node._child(parts, i, action, create)
+                nodes[parts[:i + 1]] = node
+
+        return node
+
+    def diff(self, other):
+        """Returns the operations that turn this collection into other, a
+        DottedCollection or a plain value of the same type. Operations are
+        ('add', key, value), ('replace', key, value) and ('remove', key)
+        tuples with dotted keys and plain values. Subtrees that are the same
+        object are skipped without comparing them. See apply_patch().
+        """
+        source = _source(other)
+        if not isinstance(source, type(self.store)):
+            raise ValueError('cannot compare {0} with {1}'.format(
+                repr(self), repr(other)))
+
+        ops = []
+        _diff(self.store, source, '', ops)
+        return ops
+
+    def apply_patch(self, ops):
+        """Applies the operations returned by diff() in order. Nodes shared
+        by several operations are walked only once. Missing nodes are
+        created by 'add' operations, that insert items in lists like
+        list.insert() does.
+        """
+        nodes = {(): self}
+
+        for op in ops:
+            name, parts = op[0], _flat_parts(op[1])
+            node = self._walk_cached(nodes, parts, name, create=name == 'add')
+            key = parts[-1]
+            store = node.store
+            # list items after the key are moved to other indexes
+            moved = name in ('add', 'remove') and isinstance(store, list) \
+                and _is_index(key) and int(key) < len(store) - (
+                    name == 'remove')
+
+            if name == 'add':
+                if moved:
+                    node.insert(int(key), op[2])
+                else:
+                    node._set_key(key, op[2])
+            elif name == 'replace':
+                if not node._has_key(key):
+                    raise (IndexError if isinstance(store, list)
+                           else KeyError)('cannot replace "{0}"'.format(op[1]))
+                node._set_key(key, op[2])
+            elif name == 'remove':
+                node._del_key(key)
+            else:
+                raise ValueError('{0} is not a patch operation'.format(name))
+
+            if moved:
+                _forget(nodes, parts[:-1], children_only=True)
+            elif name != 'add' and parts in nodes:
+                _forget(nodes, parts)
+
+    def iterflatten(self):
+        """Yields a (dotted key, value) pair for every leaf value. Empty dicts
+        and lists are leaves too, so from_flat() can rebuild the collection.
+        Keys keep their escaped dots.
+        """
+        stack = [('', _iter_store(self.store))]
+
+        while stack:
+            prefix, items = stack[-1]
+
+            for key, value in items:
+                if isinstance(value, DottedCollection):
+                    value = value.store
+                if isinstance(value, (dict, list)):
+                    if value:
+                        stack.append((prefix + key + '.', _iter_store(value)))
+                        break
+                    value = type(value)()
+                yield prefix + key, value
+            else:
+                stack.pop()
+
+    def flatten(self):
+        """Returns a dict with every leaf value by dotted key. See
+        iterflatten().
+        """
+        return dict(self.iterflatten())
+
+    def deep_merge(self, other, list_strategy='replace'):
+        """Merges a dict or a list into this collection in a single pass.
+        Nested dicts are merged key by key and their keys are dotted paths,
+        so mappings of dotted keys can be merged too. Unchanged values keep
+        their nodes.
+
+        Lists are replaced unless list_strategy is 'append', to add the new
+        items, or 'merge', to merge the items with the same index.
+        """
+        if list_strategy not in LIST_STRATEGIES:
+            raise ValueError('{0} is not a list strategy'.format(
+                list_strategy))
+
+        source = _source(other)
+        if not isinstance(source, (dict, list)) \
+                or isinstance(source, list) != isinstance(self.store, list):
+            raise ValueError('cannot merge {0} into {1}'.format(
+                repr(other), repr(self)))
+
+        self._merge(source, list_strategy)
+
+    def _merge(self, source, strategy):
+        """Merges the store of another collection, or a plain dict or list
+        of the same type, into this one.
+        """
+        if isinstance(source, dict):
+            for key, value in iteritems(source):
+                if isinstance(key, basestring) and "." not in key:
+                    self._merge_key(key, value, strategy)
+                    continue
+                parts = _key_parts(key)
+                node = self if len(parts) == 1 \
+                    else self._walk(parts, 'merge', create=True)
+                node._merge_key(parts[-1], value, strategy)
+        elif strategy == 'merge':
+            for index, value in enumerate(source):
+                self._merge_key(index, value, strategy)
+        else:
+            if strategy == 'append':
+                start = len(self.store)
+            else:
+                start = 0
+                while len(self.store) > len(source):
+                    self._del_key(len(self.store) - 1)
+
+            for index, value in enumerate(source, start):
+                if index < len(self.store) \
+                        and _same(self.store[index], value):
+                    continue
+                self._set_key(index, _export(value))
+
+    def _merge_key(self, key, value, strategy):
+        if isinstance(self.store, list):
+            exists = _is_index(key) and int(key) < len(self.store)
+            key = int(key) if exists else key
+        else:
+            exists = key in self.store
+
+        if exists:
+            current = self.store[key]
+            if self._lazy:
+                current = self._lazy_value(key, current)
+            # cheaper than isinstance() with the abstract class for leaves
+            store = getattr(current, 'store', None)
+            if store is not None and isinstance(current, DottedCollection):
+                source = _source(value)
+                if isinstance(source, type(store)):
+                    current._merge(source, strategy)
+                    return
+            elif _same(current, value):
+                return
+        elif isinstance(value, dict) and _has_dotted_keys(value):
+            # new dicts are merged too, so their keys are dotted paths
+            self._set_key(key, {})
+            self._get_key(key)._merge(_source(value), strategy)
+            return
+
+        self._set_key(key, _export(value))
+
+    def query(self, pattern):
+        """Yields a (dotted key, value) pair for every path matching pattern,
+        in document order. See compile_query().
+        """
+        return compile_query(pattern).iter(self)
+
+    def get_many(self, keys, default=_MISSING):
+        """Returns a list with the values of several dotted keys, in the same
+        order. Shared prefixes are walked only once. Missing keys raise
+        KeyError or IndexError unless a default value is given.
+        """
+        keys = list(keys)
+        trie = _PathTrie()
+        for position, key in enumerate(keys):
+            trie.add(_key_parts(key)).positions.append(position)
+
+        results = [default] * len(keys)
+        self._get_many(trie, results, default)
+        return results
+
+    def _get_many(self, trie, results, default):
+        for key, node in iteritems(trie.children):
+            try:
+                if node.positions:
+                    value = self._get_key(key)
+                    for position in node.positions:
+                        results[position] = value
+                if node.children:
+                    self._child(trie.first_step(key), 0, 'get')._get_many(
+                        node, results, default)
+            except (KeyError, IndexError):
+                if default is _MISSING:
+                    raise
+
+    def set_many(self, items):
+        """Sets several dotted keys at once. items can be a mapping or an
+        iterable of (key, value) pairs, applied as if they were set in order.
+        Shared prefixes are walked only once and missing nodes are created
+        like __setitem__ does.
+        """
+        trie = _PathTrie()
+        for key, value in iteritems(items) if hasattr(items, 'keys') \
+                else items:
+            node = trie.add(_key_parts(key))
+            # the new value replaces anything previously set below it
+            node.children.clear()
+            node.value = value
+            node.is_key = True
+
+        self._set_many(trie)
+
+    def _set_many(self, trie):
+        for key, node in iteritems(trie.children):
+            if node.is_key:
+                self._set_key(key, node.value)
+            if node.children:
+                self._child(trie.first_step(key), 0, 'set', create=True) \
+                    ._set_many(node)
+
+    def delete_many(self, keys):
+        """Deletes several dotted keys at once. Shared prefixes are walked
+        only once. List indexes refer to the positions before any key is
+        deleted.
+        """
+        trie = _PathTrie()
+        for key in keys:
+            trie.add(_key_parts(key)).is_key = True
+
+        self._delete_many(trie)
+
+    def _delete_many(self, trie):
+        keys = []
+        for key, node in iteritems(trie.children):
+            if node.is_key:
+                keys.append(key)
+            elif node.children:
+                self._child(trie.first_step(key), 0, 'delete') \
+                    ._delete_many(node)
+
+        if isinstance(self, collections.MutableSequence):
+            # delete from the end so remaining indexes are still valid
+            size = len(self)
+            keys.sort(reverse=True, key=lambda index: (
+                -1 if not _is_index(index)
+                else int(index) + size if int(index) < 0 else int(index)))
+
+        for key in keys:
+            self._del_key(key)
 
     def __len__(self):
         return len(self.store)
@@ -132,7 +872,29 @@ class DottedCollection(object):
         return repr(self.store)
 
     def to_json(self):
-        return json.dumps(self, cls=DottedJSONEncoder)
+        """Returns a JSON string. The cached plain copy of the collection is
+        given to the JSON backend so nested nodes need no special encoding.
+        """
+        return backends.dumps(self._export())
+
+    # Copies and pickles are built from a plain copy in one pass.
+    # The index and the tracked changes are not kept.
+
+    def __getstate__(self):
+        return self._export(), self._lazy, self._validate
+
+    def __reduce__(self):
+        return _rebuild, (type(self), ) + self.__getstate__()
+
+    def __copy__(self):
+        return _rebuild(type(self), *self.__getstate__())
+
+    def __deepcopy__(self, memo):
+        plain, lazy, validate = self.__getstate__()
+        result = _rebuild(type(self), _deepcopy_plain(plain, memo), lazy,
+                          validate)
+        memo[id(self)] = result
+        return result
 
     @abstractmethod
     def __getitem__(self, name):
@@ -151,191 +913,566 @@ class DottedCollection(object):
         pass
 
 
+def _to_python(value):
+    """Returns a plain python copy of a value. Nested dicts and lists not yet
+    wrapped by a lazy collection are copied too.
+    """
+    if isinstance(value, DottedCollection):
+        return value.to_python()
+    elif isinstance(value, dict):
+        return dict((key, _to_python(item)) for key, item in iteritems(value))
+    elif isinstance(value, list):
+        return [_to_python(item) for item in value]
+    return value
+
+
+def _flat_parts(key):
+    """Returns the keys of a dotted path without using the cache of
+    parse_key(), for keys that are rarely repeated.
+    """
+    if isinstance(key, basestring):
+        return tuple(split_key(key))
+    return _key_parts(key)
+
+
+def _forget(nodes, parts, children_only=False):
+    """Removes a node and its descendants from a dict of nodes by their
+    tuple of parts, or only its descendants.
+    """
+    size = len(parts)
+    for cached in [cached for cached in nodes if cached[:size] == parts
+                   and (len(cached) > size or not children_only)]:
+        del nodes[cached]
+
+
+def _diff(old, new, prefix, ops):
+    """Adds the operations that turn the store old into new to ops"""
+    if isinstance(old, dict):
+        for key, value in iteritems(old):
+            if key in new:
+                _diff_value(value, new[key], prefix + str(key), ops)
+            else:
+                ops.append(('remove', prefix + str(key)))
+        for key, value in iteritems(new):
+            if key not in old:
+                ops.append(('add', prefix + str(key), _to_python(value)))
+    else:
+        common = min(len(old), len(new))
+        for index in range(common):
+            _diff_value(old[index], new[index], prefix + str(index), ops)
+        # from the end so the indexes are still valid
+        for index in range(len(old) - 1, common - 1, -1):
+            ops.append(('remove', prefix + str(index)))
+        for index in range(common, len(new)):
+            ops.append(('add', prefix + str(index), _to_python(new[index])))
+
+
+def _diff_value(old, new, path, ops):
+    if old is new:
+        return
+
+    old, new = _source(old), _source(new)
+
+    if old is new:
+        return
+    if isinstance(old, (dict, list)) and isinstance(new, type(old)):
+        _diff(old, new, path + '.', ops)
+    elif _kind(old) is not _kind(new) or old != new:
+        ops.append(('replace', path, _to_python(new)))
+
+
+def _kind(value):
+    """Returns the type of a value for diffs. str and unicode, and int and
+    long on Python 2, are the same kind, but bools, ints and floats are not.
+    """
+    if isinstance(value, basestring):
+        return basestring
+    if isinstance(value, integer_types) and not isinstance(value, bool):
+        return int
+    return type(value)
+
+
+def _rebuild(cls, plain, lazy, validate=True):
+    """Returns a new collection of class cls from a plain value that was
+    already validated. Nested values of a lazy collection are validated
+    when they are wrapped, if validate is True.
+    """
+    if issubclass(cls, _Frozen):
+        return cls(plain, validate=False)
+    result = cls(plain, lazy=lazy, validate=False)
+    object.__setattr__(result, '_validate', validate)
+    return result
+
+
+def _deepcopy_plain(value, memo):
+    """Returns a deep copy of a plain value that shares immutable leaf
+    values, which is faster than copy.deepcopy() for JSON-like data.
+    """
+    if isinstance(value, dict):
+        return dict((key, _deepcopy_plain(item, memo))
+                    for key, item in iteritems(value))
+    elif isinstance(value, list):
+        return [_deepcopy_plain(item, memo) for item in value]
+    elif isinstance(value, _ATOMIC):
+        return value
+    return copy.deepcopy(value, memo)
+
+
+def _source(value):
+    """Returns the store of a DottedCollection, or the value itself"""
+    if isinstance(value, DottedCollection):
+        return value.store
+    return value
+
+
+def _export(value):
+    """Returns the plain value of a DottedCollection, or the value itself"""
+    if isinstance(value, DottedCollection):
+        return value._export()
+    return value
+
+
+def _has_dotted_keys(value):
+    """Returns True if a plain dict or list has any not-escaped dotted key"""
+    if isinstance(value, list):
+        return any(_has_dotted_keys(item) for item in value)
+    elif isinstance(value, dict):
+        return any(
+            isinstance(key, basestring) and "." in key and is_dotted_key(key)
+            or _has_dotted_keys(item) for key, item in iteritems(value))
+    return False
+
+
+def _same(current, value):
+    """Returns True if a stored leaf value does not need to be replaced"""
+    return type(current) is type(value) and not isinstance(
+        value, (dict, list)) and current == value
+
+
+def _iter_store(store):
+    """Yields (key, value) pairs of a dict or list store, with text keys"""
+    if isinstance(store, list):
+        return ((str(index), value) for index, value in enumerate(store))
+    return ((key if isinstance(key, basestring) else str(key), value)
+            for key, value in iteritems(store))
+
+
+def _iter_items(store):
+    """Yields the (key, value) pairs of a dict or list store"""
+    if isinstance(store, list):
+        return enumerate(store)
+    return iteritems(store)
+
+
+def _index_tree(index, path, value):
+    """Adds value and its wrapped descendants to index. Lazy values not yet
+    wrapped are added without their descendants.
+    """
+    if index.values is not None:
+        index.values[path] = value
+    if isinstance(value, DottedCollection):
+        object.__setattr__(value, '_index', index)
+        index.prefixes[id(value)] = path + '.'
+        for key, item in _iter_store(value.store):
+            _index_tree(index, path + '.' + key, item)
+
+
+def _unindex_tree(index, path, value):
+    """Removes value and its descendants from index"""
+    if index.values is not None:
+        index.values.pop(path, None)
+    if isinstance(value, DottedCollection) and value._index is index:
+        for key, item in _iter_store(value.store):
+            _unindex_tree(index, path + '.' + key, item)
+        del index.prefixes[id(value)]
+        object.__setattr__(value, '_index', None)
+
+
+def _is_index(index):
+    return isinstance(index, int) \
+        or (isinstance(index, basestring) and index.isdigit())
+
+
+def _key_parts(key):
+    """Returns the keys of a dotted path. Other keys are returned as a
+    single key path.
+    """
+    if isinstance(key, (basestring, DottedPath)):
+        return parse_key(key).parts
+    return (key, )
+
+
+def _column(values, format):
+    """Converts a list of values to the given column format"""
+    if format == 'list':
+        return values
+    if format not in ('array', 'numpy', 'auto'):
+        raise ValueError('{0} is not a column format'.format(format))
+
+    if all(isinstance(value, integer_types) and not isinstance(value, bool)
+           for value in values):
+        typecode = _INT_TYPECODE
+    elif all(isinstance(value, integer_types + (float, ))
+             and not isinstance(value, bool)
+             for value in values):
+        typecode = 'd'
+    else:
+        typecode = None
+
+    # auto columns don't let NumPy coerce mixed values
+    if format == 'numpy' or format == 'auto' and typecode is not None:
+        try:
+            import numpy
+        except ImportError:
+            if format == 'numpy':
+                raise
+        else:
+            return numpy.array(values)
+
+    if typecode is not None:
+        return array.array(typecode, values)
+    if format == 'array':
+        raise TypeError('array columns must contain numbers only')
+    return values
+
+
+class _LeafIndex(object):
+    """The full dotted paths of an indexed or tracked tree. prefixes has
+    the path of every node, followed by a dot, by node id. values has every
+    value by its path if the tree is indexed and changes the modified paths
+    if it's tracked, or they're None.
+    """
+
+    __slots__ = ('values', 'prefixes', 'changes')
+
+    def __init__(self):
+        self.values = None
+        self.prefixes = {}
+        self.changes = None
+
+    def get(self, node, key):
+        """Returns the value of a dotted key of node, or _MISSING if it's not
+        indexed yet.
+        """
+        if self.values is None:
+            return _MISSING
+        if isinstance(key, DottedPath):
+            key = key.key
+        value = self.values.get(self.prefixes[id(node)] + key, _MISSING)
+        # lazy values must be wrapped by walking the path
+        if isinstance(value, (dict, list)):
+            return _MISSING
+        return value
+
+
+class _PathTrie(object):
+    """Groups the parts of several dotted keys by their shared prefixes"""
+
+    __slots__ = ('children', 'positions', 'value', 'is_key')
+
+    def __init__(self):
+        self.children = collections.OrderedDict()
+        self.positions = []
+        self.value = None
+        self.is_key = False
+
+    def add(self, parts):
+        """Returns the node for parts, creating missing nodes"""
+        node = self
+        for part in parts:
+            child = node.children.get(part)
+            if child is None:
+                child = node.children[part] = _PathTrie()
+            node = child
+        return node
+
+    def first_step(self, key):
+        """Returns the (key, next key) path used to reach the child key"""
+        return key, next(iter(self.children[key].children))
+
+
 class DottedList(DottedCollection, collections.MutableSequence):
     """A list with support for the dotted path syntax"""
 
-    def __init__(self, initial=None):
+    __slots__ = ()
+
+    def __init__(self, initial=None, lazy=False, validate=True):
         DottedCollection.__init__(
             self,
-            [] if initial is None else list(initial)
+            [] if initial is None else list(initial),
+            lazy=lazy,
+            validate=validate
         )
 
+    def __iter__(self):
+        if not self._lazy:
+            return iter(self.store)
+        return (self._lazy_value(index, value)
+                for index, value in enumerate(self.store))
+
     def __getitem__(self, index):
+        if isinstance(index, int):
+            value = self.store[index]
+            return self._lazy_value(index, value) if self._lazy else value
+
         if isinstance(index, slice):
+            if self._lazy:
+                for i in range(*index.indices(len(self.store))):
+                    self._lazy_value(i, self.store[i])
             return self.store[index]
 
-        if isinstance(index, int) \
-                or (isinstance(index, basestring) and index.isdigit()):
-            return self.store[int(index)]
+        if self._index is not None and isinstance(
+                index, (basestring, DottedPath)):
+            value = self._index.get(self, index)
+            if value is not _MISSING:
+                return value
 
-        elif isinstance(index, basestring) and is_dotted_key(index):
-            my_index, alt_index = split_key(index, 1)
-            target = self.store[int(my_index)]
+        parts = _key_parts(index)
 
-            # required by the dotted path
-            if not isinstance(target, DottedCollection):
-                raise IndexError('cannot get "{0}" in "{1}" ({2})'.format(
-                    alt_index,
-                    my_index,
-                    repr(target)
-                ))
+        if len(parts) == 1:
+            return self._get_key(parts[0])
 
-            return target[alt_index]
-
-        else:
-            raise IndexError('cannot get %s in %s' % (index, repr(self.store)))
+        return self._walk(parts, 'get')._get_key(parts[-1])
 
     def __setitem__(self, index, value):
-        if isinstance(index, int) \
-                or (isinstance(index, basestring) and index.isdigit()):
-            # If the index does not exist in the list but it's the same index
-            # we would obtain by appending the value to the list we actually
-            # append the value. (***)
-            if int(index) not in self.store and int(index) == len(self.store):
-                self.store.append(DottedCollection.factory(value))
-            else:
-                self.store[int(index)] = DottedCollection.factory(value)
+        parts = _key_parts(index)
 
-        elif isinstance(index, basestring) and is_dotted_key(index):
-            my_index, alt_index = split_key(index, 1)
+        if len(parts) == 1:
+            self._set_key(parts[0], value)
+        else:
+            self._walk(parts, 'set', create=True)._set_key(parts[-1], value)
 
-            # (***)
-            if int(my_index) not in self.store \
-                    and int(my_index) == len(self.store):
-                self.store.append(
-                    DottedCollection._factory_by_index(alt_index))
+    def __delitem__(self, index):
+        parts = _key_parts(index)
 
-            if not isinstance(self[int(my_index)], DottedCollection):
-                raise IndexError('cannot set "%s" in "%s" (%s)' % (
-                    alt_index, my_index, repr(self[int(my_index)])))
+        if len(parts) == 1:
+            self._del_key(parts[0])
+        else:
+            self._walk(parts, 'delete')._del_key(parts[-1])
 
-            self[int(my_index)][alt_index] = DottedCollection.factory(value)
+    def _get_key(self, index):
+        if not _is_index(index):
+            raise IndexError('cannot get %s in %s' % (index, repr(self.store)))
+        index = int(index)
+        return self._lazy_value(index, self.store[index])
 
-        else:
+    def _set_key(self, index, value):
+        if not _is_index(index):
             raise IndexError('cannot use %s as index in %s' % (
                 index, repr(self.store)))
 
-    def __delitem__(self, index):
-        if isinstance(index, int) \
-                or (isinstance(index, basestring) and index.isdigit()):
-            del self.store[int(index)]
+        # If the index does not exist in the list but it's the same index
+        # we would obtain by appending the value to the list we actually
+        # append the value.
+        value = self._adopt(DottedCollection.factory(value, lazy=self._lazy))
+        index = int(index)
 
-        elif isinstance(index, basestring) and is_dotted_key(index):
-            my_index, alt_index = split_key(index, 1)
-            target = self.store[int(my_index)]
-
-            # required by the dotted path
-            if not isinstance(target, DottedCollection):
-                raise IndexError('cannot delete "%s" in "%s" (%s)' % (
-                    alt_index, my_index, repr(target)))
+        if index == len(self.store):
+            self.store.append(value)
+        else:
+            if self._index is not None:
+                index = range(len(self.store))[index]
+                self._unindex_items([index])
+            self.store[index] = value
+        self._changed()
 
-            del target[alt_index]
+        if self._index is not None:
+            self._index_items([index])
 
-        else:
+    def _del_key(self, index):
+        if not _is_index(index):
             raise IndexError('cannot delete %s in %s' % (
                 index, repr(self.store)))
+        if self._index is None:
+            del self.store[int(index)]
+        else:
+            # the following items are moved to other paths
+            index = range(len(self.store))[int(index)]
+            self._unindex_items(range(index, len(self.store)))
+            del self.store[index]
+            self._index_items(range(index, len(self.store)))
+        self._changed()
 
-    def to_python(self):
+    def _has_key(self, index):
+        return _is_index(index) and int(index) < len(self.store)
+
+    def to_python(self, copy=True):
         """Returns a plain python list and converts to plain python objects all
         this object's descendants.
-        """
-        result = list(self)
 
-        for index, value in enumerate(result):
-            if isinstance(value, DottedCollection):
-                result[index] = value.to_python()
-
-        return result
+        If copy is False the result is cached and shared by every call until
+        this collection or a descendant is modified, so it must be treated
+        as read-only.
+        """
+        if not copy:
+            return self._export(cache=True)
+        return [_to_python(value) for value in self.store]
 
     def insert(self, index, value):
-        self.store.insert(index, value)
+        value = self._adopt(DottedCollection.factory(value, lazy=self._lazy))
+
+        if self._index is None:
+            self.store.insert(index, value)
+        else:
+            # the following items are moved to other paths
+            start = slice(index, None).indices(len(self.store))[0]
+            self._unindex_items(range(start, len(self.store)))
+            self.store.insert(start, value)
+            self._index_items(range(start, len(self.store)))
+        self._changed()
+
+    def column(self, path, default=_MISSING, format='list'):
+        """Returns the value of a dotted key in every item of the list. See
+        columns().
+        """
+        return self.columns([path], default, format)[0]
+
+    def columns(self, paths, default=_MISSING, format='list'):
+        """Returns a column with the values of each dotted key in every item
+        of the list, reading all of them in a single pass. Paths are parsed
+        once and the nested stores are read directly. Missing keys raise
+        KeyError unless a default value is given.
+
+        Columns are lists, unless format is 'array' for an array.array of
+        numbers, 'numpy' for a NumPy array or 'auto' for a NumPy array, or
+        an array.array if NumPy is not installed, if every value is a number
+        and a list otherwise.
+        """
+        steps = [
+            [(part, int(part) if _is_index(part) else None)
+             for part in _key_parts(path)]
+            for path in paths
+        ]
+        columns = [[] for _ in steps]
+
+        for position, item in enumerate(self.store):
+            for path, keys, column in zip(paths, steps, columns):
+                value = item
+                for key, index in keys:
+                    try:
+                        store = value.store
+                    except AttributeError:
+                        # lazy collections can have plain dicts and lists
+                        store = value
+                    try:
+                        value = store[index if type(store) is list else key]
+                    except (KeyError, IndexError, TypeError):
+                        value = _MISSING
+                        break
+
+                if value is _MISSING:
+                    if default is _MISSING:
+                        raise KeyError('cannot get "{0}" in item {1}'.format(
+                            path, position))
+                    value = default
+                column.append(value)
+
+        return [_column(values, format) for values in columns]
 
 
 class DottedDict(DottedCollection, collections.MutableMapping):
     """A dict with support for the dotted path syntax"""
-    def __init__(self, initial=None):
+
+    __slots__ = ()
+
+    def __init__(self, initial=None, lazy=False, validate=True):
         DottedCollection.__init__(
             self,
-            {} if initial is None else dict(initial)
+            {} if initial is None else dict(initial),
+            lazy=lazy,
+            validate=validate
         )
 
     def __getitem__(self, k):
         key = self.__keytransform__(k)
 
-        if not isinstance(k, basestring) or not is_dotted_key(key):
-            return self.store[key]
+        if not isinstance(key, (basestring, DottedPath)):
+            return self._lazy_value(key, self.store[key])
 
-        my_key, alt_key = split_key(key, 1)
-        target = self.store[my_key]
+        if self._index is not None:
+            value = self._index.get(self, key)
+            if value is not _MISSING:
+                return value
 
-        # required by the dotted path
-        if not isinstance(target, DottedCollection):
-            raise KeyError('cannot get "{0}" in "{1}" ({2})'.format(
-                alt_key,
-                my_key,
-                repr(target)
-            ))
+        parts = parse_key(key).parts
 
-        return target[alt_key]
+        if len(parts) == 1:
+            value = self.store[parts[0]]
+            return self._lazy_value(parts[0], value) if self._lazy else value
+
+        return self._walk(parts, 'get')._get_key(parts[-1])
 
     def __setitem__(self, k, value):
-        key = self.__keytransform__(k)
+        parts = _key_parts(self.__keytransform__(k))
 
-        if not isinstance(k, basestring):
-            raise KeyError('DottedDict keys must be str or unicode')
-        elif not is_dotted_key(key):
-            self.store[key] = DottedCollection.factory(value)
+        if len(parts) == 1:
+            self._set_key(parts[0], value)
         else:
-            my_key, alt_key = split_key(key, 1)
+            self._walk(parts, 'set', create=True)._set_key(parts[-1], value)
 
-            if my_key not in self.store:
-                self.store[my_key] = DottedCollection._factory_by_index(alt_key)
+    def __delitem__(self, k):
+        parts = _key_parts(self.__keytransform__(k))
 
-            self.store[my_key][alt_key] = value
+        if len(parts) == 1:
+            self._del_key(parts[0])
+        else:
+            self._walk(parts, 'delete')._del_key(parts[-1])
 
-    def __delitem__(self, k):
-        key = self.__keytransform__(k)
+    def _get_key(self, key):
+        return self._lazy_value(key, self.store[key])
 
-        if not isinstance(k, basestring) or not is_dotted_key(key):
-            del self.store[key]
+    def _set_key(self, key, value):
+        if not isinstance(key, basestring):
+            raise KeyError('DottedDict keys must be str or unicode')
+        value = self._adopt(DottedCollection.factory(value, lazy=self._lazy))
 
-        else:
-            my_key, alt_key = split_key(key, 1)
-            target = self.store[my_key]
+        if self._index is not None and key in self.store:
+            self._unindex_items([key])
+        self.store[key] = value
+        self._changed()
 
-            if not isinstance(target, DottedCollection):
-                raise KeyError('cannot delete "{0}" in "{1}" ({2})'.format(
-                    alt_key,
-                    my_key,
-                    repr(target)
-                ))
+        if self._index is not None:
+            self._index_items([key])
 
-            del target[alt_key]
+    def _del_key(self, key):
+        if self._index is not None and key in self.store:
+            self._unindex_items([key])
+        del self.store[key]
+        self._changed()
 
-    def to_python(self):
+    def _has_key(self, key):
+        return key in self.store
+
+    def to_python(self, copy=True):
         """Returns a plain python dict and converts to plain python objects all
         this object's descendants.
-        """
-        result = dict(self)
-
-        for key, value in iteritems(result):
-            if isinstance(value, DottedCollection):
-                result[key] = value.to_python()
 
-        return result
+        If copy is False the result is cached and shared by every call until
+        this collection or a descendant is modified, so it must be treated
+        as read-only.
+        """
+        if not copy:
+            return self._export(cache=True)
+        return dict(
+            (key, _to_python(value)) for key, value in iteritems(self.store))
 
-    __getattr__ = __getitem__
+    def __getattr__(self, k):
+        try:
+            return self.__getitem__(k)
+        except KeyError as error:
+            raise DottedKeyError(*error.args)
 
-    # self.store does not exist before __init__() initializes it
+    # Only store is a real attribute, anything else is an item. The other
+    # slots are set with object.__setattr__()
 
     def __setattr__(self, key, value):
-        if key in self.__dict__ or key == 'store':
+        if key == 'store':
             object.__setattr__(self, key, value)
         else:
             self.__setitem__(key, value)
 
     def __delattr__(self, key):
-        if key in self.__dict__ or key == 'store':
+        if key == 'store':
             object.__delattr__(self, key)
         else:
             self.__delitem__(key)
@@ -343,21 +1480,491 @@ class DottedDict(DottedCollection, collections.MutableMapping):
     def __contains__(self, k):
         key = self.__keytransform__(k)
 
-        if not isinstance(k, basestring) or not is_dotted_key(key):
-            return self.store.__contains__(key)
+        if not isinstance(key, (basestring, DottedPath)):
+            return key in self.store
 
-        my_key, alt_key = split_key(key, 1)
-        target = self.store[my_key]
+        if self._index is not None \
+                and self._index.get(self, key) is not _MISSING:
+            return True
 
-        if not isinstance(target, DottedCollection):
+        parts = parse_key(key).parts
+
+        if len(parts) == 1:
+            return parts[0] in self.store
+
+        try:
+            node = self._walk(parts, 'get')
+        except (KeyError, IndexError, ValueError):
             return False
 
-        return alt_key in target
+        return node._has_key(parts[-1])
 
     def __keytransform__(self, key):
         return key
 
 
+#
+# Frozen collections
+#
+
+
+def freeze(initial, validate=True):
+    """Returns a FrozenDottedDict or a FrozenDottedList based on the type of
+    the initial value, that can be a dict, a list or a DottedCollection. In
+    other case the same original value will be returned.
+    """
+    if isinstance(initial, _Frozen):
+        return initial
+    if isinstance(initial, DottedCollection):
+        initial, validate = initial.to_python(), False
+
+    if isinstance(initial, list):
+        return FrozenDottedList(initial, validate=validate)
+    elif isinstance(initial, dict):
+        return FrozenDottedDict(initial, validate=validate)
+    else:
+        return initial
+
+
+class _Frozen(object):
+    """Immutable DottedCollection. The hash is computed once and set()
+    and delete() return a new collection that shares every subtree out of
+    the modified path.
+    """
+
+    __slots__ = ()
+
+    def _freeze(self, initial, validate):
+        # nested values are wrapped here instead of by DottedCollection
+        DottedCollection.__init__(self, initial, lazy=True, validate=validate)
+        self._lazy = False
+        self._hash = None
+
+        for key, value in _iter_items(self.store):
+            if isinstance(value, (dict, list, DottedCollection)):
+                self.store[key] = freeze(value, validate=validate)
+
+    @classmethod
+    def from_flat(cls, items):
+        """Returns a new frozen collection from a mapping or an iterable of
+        (dotted key, value) pairs. See DottedCollection.from_flat().
+        """
+        base = DottedList if issubclass(cls, DottedList) else DottedDict
+        return cls(base.from_flat(items)._export(), validate=False)
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError('{0} is immutable'.format(type(self).__name__))
+
+    __setitem__ = __delitem__ = _set_key = _del_key = _merge = _readonly
+
+    def _child(self, parts, i, action, create=False):
+        # missing nodes would be created in the store
+        if create:
+            self._readonly()
+        return DottedCollection._child(self, parts, i, action)
+
+    def __setattr__(self, key, value):
+        if key not in DottedCollection.__slots__ and key != '_hash':
+            self._readonly()
+        object.__setattr__(self, key, value)
+
+    def __delattr__(self, key):
+        self._readonly()
+
+    def __hash__(self):
+        if self._hash is None:
+            if isinstance(self.store, list):
+                self._hash = hash(tuple(self.store))
+            else:
+                self._hash = hash(frozenset(iteritems(self.store)))
+        return self._hash
+
+    def __eq__(self, other):
+        if self is other:
+            return True
+        if not isinstance(other, DottedCollection):
+            # plain mappings compare like they do with a DottedDict
+            return super(_Frozen, self).__eq__(other)
+        if isinstance(other, _Frozen) and self._hash is not None \
+                and other._hash is not None and self._hash != other._hash:
+            return False
+        return self.store == other.store
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    def set(self, key, value):
+        """Returns a copy of this collection with a dotted key set to value.
+        Only the nodes on the path are copied. Missing nodes are created like
+        __setitem__ does.
+        """
+        return self._assoc(_key_parts(key), 0, freeze(value))
+
+    def delete(self, key):
+        """Returns a copy of this collection without a dotted key. Only the
+        nodes on the path are copied.
+        """
+        return self._assoc(_key_parts(key), 0, _MISSING)
+
+    def _assoc(self, parts, i, value):
+        """Returns a copy of this node where parts[i:] is set to value, or
+        deleted if value is _MISSING.
+        """
+        key = parts[i]
+        store = type(self.store)(self.store)
+
+        if isinstance(store, list):
+            if not _is_index(key):
+                raise IndexError('cannot use %s as index in %s' % (
+                    key, repr(store)))
+            key = int(key)
+            exists = -len(store) <= key < len(store)
+        else:
+            if not isinstance(key, basestring):
+                raise KeyError('DottedDict keys must be str or unicode')
+            exists = key in store
+
+        if i < len(parts) - 1:
+            if exists:
+                child = store[key]
+            elif value is _MISSING:
+                raise KeyError(key) if isinstance(store, dict) \
+                    else IndexError(key)
+            else:
+                child = freeze(DottedCollection._factory_by_index(
+                    parts[i + 1]))
+            if not isinstance(child, _Frozen):
+                raise KeyError('cannot set "{0}" in "{1}" ({2})'.format(
+                    ".".join(parts[i + 1:]), parts[i], repr(child)))
+            value = child._assoc(parts, i + 1, value)
+        elif value is _MISSING:
+            del store[key]
+            return self._copy_with(store)
+
+        if isinstance(store, list) and key == len(store):
+            store.append(value)
+        else:
+            store[key] = value
+
+        return self._copy_with(store)
+
+    def _copy_with(self, store):
+        node = object.__new__(type(self))
+        for name in DottedCollection.__slots__:
+            object.__setattr__(node, name, None)
+        node.store = store
+        node._lazy = False
+        node._hash = None
+        return node
+
+    def enable_index(self):
+        # nodes can be shared by several collections
+        self._readonly()
+
+    enable_tracking = enable_index
+
+
+class FrozenDottedList(_Frozen, DottedList):
+    """An immutable and hashable DottedList"""
+
+    __slots__ = ('_hash', )
+
+    def __init__(self, initial=None, validate=True):
+        self._freeze([] if initial is None else list(initial), validate)
+
+    insert = _Frozen._readonly
+
+
+class FrozenDottedDict(_Frozen, DottedDict):
+    """An immutable and hashable DottedDict"""
+
+    __slots__ = ('_hash', )
+
+    def __init__(self, initial=None, validate=True):
+        self._freeze({} if initial is None else dict(initial), validate)
+
+
+#
+# Queries
+#
+
+
+class DottedQuery(object):
+    """A dotted key pattern compiled once. A * key matches any key of a dict
+    or index of a list and a ** key matches any number of keys, even none.
+    Escape them as \\* and \\*\\* to match keys named * or **.
+
+    DottedQuery("orders.*.items.**.sku").iter(obj)
+
+    yields every sku inside the items of every order, with its path.
+    """
+
+    __slots__ = ('pattern', 'parts', 'unique')
+
+    def __init__(self, pattern):
+        parts = []
+        for part in split_key(pattern):
+            # consecutive ** keys match the same paths as a single one
+            if part != '**' or not parts or parts[-1] != '**':
+                parts.append(part)
+
+        self.pattern = pattern
+        self.parts = tuple(parts)
+        # with several ** keys a path can be matched in different ways
+        self.unique = parts.count('**') < 2
+
+    def iter(self, value):
+        """Yields a (dotted key, value) pair for every match inside value,
+        lazily and in document order.
+        """
+        parts = self.parts
+        size = len(parts)
+        seen = None if self.unique else set()
+        stack = [iter([(value, '', 0)])]
+
+        while stack:
+            for value, path, i in stack[-1]:
+                if i == size:
+                    if seen is None or path not in seen:
+                        if seen is not None:
+                            seen.add(path)
+                        yield path, value
+                    continue
+
+                part = parts[i]
+
+                if part == '**':
+                    states = itertools.chain(
+                        [(value, path, i + 1)],
+                        _query_children(value, path, i))
+                elif part == '*':
+                    states = _query_children(value, path, i + 1)
+                else:
+                    key = part.replace('\\*', '*')
+                    child = _query_child(value, key)
+                    if child is _MISSING:
+                        continue
+                    states = iter([(child, path + '.' + key if path
+                                    else key, i + 1)])
+
+                stack.append(states)
+                break
+            else:
+                stack.pop()
+
+    def __repr__(self):
+        return "DottedQuery(%r)" % (self.pattern, )
+
+
+_query_cache = _LRUCache(QUERY_CACHE_SIZE)
+
+
+def compile_query(pattern):
+    """Returns the DottedQuery for a pattern. Compiled patterns are kept in
+    a bounded LRU cache.
+    """
+    if isinstance(pattern, DottedQuery):
+        return pattern
+
+    query = _query_cache.get(pattern)
+    if query is None:
+        query = DottedQuery(pattern)
+        _query_cache.set(pattern, query)
+    return query
+
+
+def _query_children(value, path, i):
+    """Yields the (value, dotted key, i) states of the children of a
+    collection, wrapping lazy values.
+    """
+    if not isinstance(value, DottedCollection):
+        return
+
+    prefix = path + '.' if path else ''
+    if isinstance(value.store, list):
+        keys = range(len(value.store))
+    else:
+        keys = list(value.store)
+
+    for key in keys:
+        yield value._lazy_value(key, value.store[key]), prefix + str(key), i
+
+
+def _query_child(value, key):
+    """Returns a child of a collection, or _MISSING"""
+    if not isinstance(value, DottedCollection):
+        return _MISSING
+
+    store = value.store
+    if isinstance(store, list):
+        if not key.isdigit() or int(key) >= len(store):
+            return _MISSING
+        key = int(key)
+    elif key not in store:
+        return _MISSING
+
+    return value._lazy_value(key, store[key])
+
+
+#
+# Compiled accessors
+#
+# The functions are generated with the steps of their paths unrolled, and
+# index the nested stores directly. Dicts and lists are accessed as they
+# are and any other node is expected to be a DottedCollection.
+#
+
+
+_accessor_cache = _LRUCache(ACCESSOR_CACHE_SIZE)
+
+_PLAIN = (dict, list)
+
+
+def _accessor(paths, source, *options):
+    """Returns the make() function generated by source(paths, *options),
+    cached by its arguments.
+    """
+    paths = tuple(parse_key(path) for path in paths)
+    key = (source, options) + tuple(path.parts for path in paths)
+
+    make = _accessor_cache.get(key)
+    if make is None:
+        namespace = {'_PLAIN': _PLAIN, '_create': _create}
+        exec(source(paths, *options), namespace)
+        make = namespace['make']
+        _accessor_cache.set(key, make)
+    return make
+
+
+def _step_source(part, target, indent):
+    """Returns the lines that replace target by its part child"""
+    if part.isdigit():
+        key = '({0} if isinstance({1}, list) else {2!r})'.format(
+            int(part), target, part)
+    else:
+        key = repr(part)
+    return [indent + 'if not isinstance({0}, _PLAIN):'.format(target),
+            indent + '    {0} = {0}.store'.format(target),
+            indent + '{0} = {0}[{1}]'.format(target, key)]
+
+
+def _getter_source(paths, single, has_default):
+    lines = ['def make(default):',
+             '    def getter(obj):']
+
+    for i, path in enumerate(paths):
+        lines.extend(['        try:',
+                      '            value = obj'])
+        for part in path.parts:
+            lines.extend(_step_source(part, 'value', ' ' * 12))
+        lines.extend([
+            '            r{0} = value'.format(i),
+            '        except (LookupError, TypeError, AttributeError):'])
+        if has_default:
+            lines.append('            r{0} = default'.format(i))
+        else:
+            lines.append('            raise KeyError({0!r})'.format(
+                'cannot get "{0}"'.format(path.key)))
+
+    if single:
+        lines.append('        return r0')
+    else:
+        lines.append('        return ({0}{1})'.format(
+            ', '.join('r{0}'.format(i) for i in range(len(paths))),
+            ',' if len(paths) == 1 else ''))
+    lines.append('    return getter')
+    return '\n'.join(lines)
+
+
+def compile_getter(path, default=_MISSING):
+    """Returns a function that gets the value of a dotted key from a
+    DottedCollection or a plain dict or list, like obj[path]. The function
+    is generated once per path. Missing keys raise KeyError, unless a
+    default is given.
+
+    compile_getter('a.b.0.c')(obj)
+
+    The values of lazy collections are returned as they are stored, so
+    nested dicts and lists may not be wrapped yet.
+    """
+    make = _accessor((path, ), _getter_source, True, default is not _MISSING)
+    return make(default)
+
+
+def compile_getters(paths, default=_MISSING):
+    """Returns a function that gets the values of several dotted keys as a
+    tuple, like operator.itemgetter(). See compile_getter().
+    """
+    make = _accessor(paths, _getter_source, False, default is not _MISSING)
+    return make(default)
+
+
+def _setter_source(paths):
+    parts = paths[0].parts
+    lines = ['def make(parts):',
+             '    def setter(obj, value):',
+             '        if not isinstance(obj, _PLAIN):']
+    # the steps of DottedCollection._walk()
+    for i in range(len(parts) - 1):
+        lines.append(
+            "            obj = obj._child(parts, {0}, 'set', True)".format(i))
+    lines.extend(['            obj._set_key(parts[-1], value)',
+                  '            return',
+                  '        node = obj'])
+
+    # plain nodes are created like DottedCollection._factory_by_index()
+    for part, next_part in zip(parts, parts[1:]):
+        lines.extend(_key_source(part, '        '))
+        lines.extend([
+            '        try:',
+            '            node = node[key]',
+            '        except LookupError:',
+            '            node = _create(node, key, {0})'.format(
+                '[]' if next_part.isdigit() else '{}')])
+
+    lines.extend(_key_source(parts[-1], '        '))
+    lines.extend([
+        '        if isinstance(node, list) and key == len(node):',
+        '            node.append(value)',
+        '        else:',
+        '            node[key] = value',
+        '    return setter'])
+    return '\n'.join(lines)
+
+
+def _key_source(part, indent):
+    """Returns the line that sets the key of part in a plain node"""
+    if part.isdigit():
+        return [indent + 'key = {0} if isinstance(node, list) else {1!r}'
+                .format(int(part), part)]
+    return [indent + 'key = {0!r}'.format(part)]
+
+
+def _create(node, key, child):
+    """Adds a missing child to a plain node"""
+    if isinstance(node, list) and key != len(node):
+        raise IndexError('list assignment index out of range')
+    if isinstance(node, list):
+        node.append(child)
+    else:
+        node[key] = child
+    return child
+
+
+def compile_setter(path):
+    """Returns a function that sets the value of a dotted key in a
+    DottedCollection or a plain dict or list, like obj[path] = value. The
+    function is generated once per path. Missing nodes are created like
+    DottedCollection does, but the keys of the values set in plain dicts
+    and lists are not validated.
+
+    compile_setter('a.b.0.c')(obj, value)
+    """
+    make = _accessor((path, ), _setter_source)
+    return make(parse_key(path).parts)
+
+
 #
 # JSON stuff
 #
@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+"""Opt-in counters and timings of the hot paths of the dotted collections.
+
+Nothing is measured until enable() is called, which replaces the measured
+functions and methods by instrumented wrappers. disable() puts the original
+ones back, so there is no overhead at all when it's disabled:
+
+    with collect() as stats:
+        obj = DottedCollection.load_json(text)
+        obj['a.b.c']
+
+    stats['keys_parsed'], stats['time']['factory']
+
+snapshot() returns:
+
+- keys_parsed: keys given to parse_key(), the entry point of every access
+  with a dotted key.
+- parse_cache_hits: how many of them were already parsed.
+- depth: a histogram of the number of keys of the parsed paths.
+- nodes_wrapped: DottedCollections created.
+- misses: KeyError and IndexError raised by __getitem__.
+- calls and time: calls and cumulative seconds of split_key,
+  is_dotted_key, factory, _validate_initial, to_json and to_python. Nested
+  calls are counted but only the outermost ones are timed.
+
+Counters are not locked, so they are approximate when several threads use
+collections at the same time.
+"""
+
+import contextlib
+import timeit
+
+from dotted import collection
+from dotted.collection import DottedCollection, DottedDict, DottedList, \
+    DottedPath
+
+
+COUNTERS = ('keys_parsed', 'parse_cache_hits', 'nodes_wrapped', 'misses')
+
+# (operation, owner, attribute) of the timed functions and methods
+TIMED = (
+    ('split_key', collection, 'split_key'),
+    ('is_dotted_key', collection, 'is_dotted_key'),
+    ('factory', DottedCollection, 'factory'),
+    ('_validate_initial', DottedCollection, '_validate_initial'),
+    ('to_json', DottedCollection, 'to_json'),
+    ('to_python', DottedList, 'to_python'),
+    ('to_python', DottedDict, 'to_python'),
+)
+
+_stats = None
+# Calls in progress of every timed operation
+_active = {}
+# Original attributes replaced by enable(), as (owner, name, value)
+_originals = []
+
+
+def reset():
+    """Sets every counter and timing to zero"""
+    global _stats
+    _stats = dict((name, 0) for name in COUNTERS)
+    _stats['depth'] = {}
+    _stats['calls'] = dict((name, 0) for name, _, _ in TIMED)
+    _stats['time'] = dict((name, 0.0) for name, _, _ in TIMED)
+
+
+def snapshot():
+    """Returns a copy of the counters and timings"""
+    result = dict(_stats)
+    for name in ('depth', 'calls', 'time'):
+        result[name] = dict(_stats[name])
+    return result
+
+
+def is_enabled():
+    return bool(_originals)
+
+
+def _timed(name, func):
+    def wrapper(*args, **kwargs):
+        _stats['calls'][name] += 1
+        if _active[name]:
+            return func(*args, **kwargs)
+
+        _active[name] += 1
+        start = timeit.default_timer()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _stats['time'][name] += timeit.default_timer() - start
+            _active[name] -= 1
+    return wrapper
+
+
+def _parse_key(func):
+    def parse_key(key):
+        _stats['keys_parsed'] += 1
+        if isinstance(key, DottedPath) or key in collection._path_cache:
+            _stats['parse_cache_hits'] += 1
+        path = func(key)
+        depth = len(path.parts)
+        _stats['depth'][depth] = _stats['depth'].get(depth, 0) + 1
+        return path
+    return parse_key
+
+
+def _init(func):
+    def __init__(self, *args, **kwargs):
+        _stats['nodes_wrapped'] += 1
+        func(self, *args, **kwargs)
+    return __init__
+
+
+def _getitem(func):
+    def __getitem__(self, key):
+        try:
+            return func(self, key)
+        except (KeyError, IndexError):
+            _stats['misses'] += 1
+            raise
+    return __getitem__
+
+
+def _replace(owner, name, wrap):
+    original = vars(owner)[name]
+    if isinstance(original, classmethod):
+        wrapper = classmethod(wrap(original.__func__))
+    else:
+        wrapper = wrap(original)
+    _originals.append((owner, name, original))
+    setattr(owner, name, wrapper)
+
+
+def enable():
+    """Starts measuring. Counters keep their values"""
+    if is_enabled():
+        return
+
+    for name, owner, attribute in TIMED:
+        _active[name] = 0
+        _replace(owner, attribute,
+                 lambda func, name=name: _timed(name, func))
+    _replace(collection, 'parse_key', _parse_key)
+    _replace(DottedCollection, '__init__', _init)
+    _replace(DottedList, '__getitem__', _getitem)
+    _replace(DottedDict, '__getitem__', _getitem)
+
+
+def disable():
+    """Stops measuring and restores the original functions"""
+    while _originals:
+        owner, name, original = _originals.pop()
+        setattr(owner, name, original)
+
+
+@contextlib.contextmanager
+def collect():
+    """Measures a block of code. Yields a dict that is filled with the
+    snapshot of the block when it ends.
+    """
+    enabled = is_enabled()
+    before = snapshot()
+    result = {}
+    enable()
+
+    try:
+        yield result
+    finally:
+        if not enabled:
+            disable()
+        result.update(_difference(snapshot(), before))
+
+
+def _difference(after, before):
+    result = {}
+    for key, value in after.items():
+        if isinstance(value, dict):
+            result[key] = dict((name, count - before[key].get(name, 0))
+                               for name, count in value.items())
+        else:
+            result[key] = value - before[key]
+    # depths that were not seen inside the block
+    result['depth'] = dict((depth, count) for depth, count
+                           in result['depth'].items() if count)
+    return result
+
+
+reset()
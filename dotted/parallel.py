@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+"""Bulk parsing and serialization in a pool of worker processes.
+
+The input is split in chunks that are parsed or serialized by the workers,
+and the results are yielded in the order of the input:
+
+    with open('export.jsonl', 'rb') as source:
+        for obj in load_many(source, workers=4, chunk_size=5000):
+            ...
+
+    with open('copy.jsonl', 'w') as target:
+        for line in dump_many(objs):
+            target.write(line + '\\n')
+
+Workers validate the keys and send plain dicts and lists back, which are
+wrapped without validating them again. Pass func to process every record in
+the workers instead, and only send back its results. Functions and results
+must be picklable, so func must be defined at the top level of a module.
+
+Workers use the JSON backend in use by the parent, so custom backends must
+be registered when the worker imports its module. Python 2 uses the
+futures backport, which is installed with this package there.
+"""
+
+from __future__ import absolute_import
+
+import collections
+import itertools
+import multiprocessing
+
+from concurrent.futures import ProcessPoolExecutor
+
+from dotted import backends
+from dotted.collection import DottedCollection, DottedDict
+
+
+CHUNK_SIZE = 1000
+
+# Chunks sent to every worker before waiting for the first result
+PREFETCH = 2
+
+
+def _chunks(items, chunk_size):
+    items = iter(items)
+    while True:
+        chunk = list(itertools.islice(items, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _map_chunks(func, chunks, args, workers):
+    """Yields the results of func(chunk, *args) for every chunk in order,
+    keeping a bounded number of chunks in flight.
+    """
+    workers = workers or multiprocessing.cpu_count()
+
+    with ProcessPoolExecutor(workers) as executor:
+        pending = collections.deque()
+        limit = PREFETCH * workers
+
+        for chunk in chunks:
+            pending.append(executor.submit(func, chunk, *args))
+            if len(pending) >= limit:
+                for result in pending.popleft().result():
+                    yield result
+
+        while pending:
+            for result in pending.popleft().result():
+                yield result
+
+
+def _load_chunk(texts, backend, validate, func):
+    backends.set_backend(backend)
+    validator = DottedDict()
+    results = []
+
+    for text in texts:
+        value = backends.loads(text)
+        if validate:
+            validator._validate_initial(value)
+        if func is not None:
+            value = func(DottedCollection.factory(value, lazy=True,
+                                                  validate=False))
+        results.append(value)
+
+    return results
+
+
+def _dump_chunk(values, backend):
+    backends.set_backend(backend)
+    return [backends.dumps(value) for value in values]
+
+
+def load_many(texts, lazy=False, validate=True, func=None, workers=None,
+              chunk_size=CHUNK_SIZE):
+    """Parses an iterable of JSON strings, like the lines of a JSON Lines
+    file, in worker processes and yields a DottedCollection for each one.
+    Workers raise ValueError for invalid JSON or keys unless validate is
+    False.
+
+    If func is given it is called by the workers with a lazy
+    DottedCollection for every string and its results are yielded instead.
+    workers defaults to the number of processors.
+    """
+    results = _map_chunks(
+        _load_chunk, _chunks(texts, chunk_size),
+        (backends.get_backend(), validate, func), workers)
+
+    if func is not None:
+        return results
+    return (DottedCollection.factory(value, lazy=lazy, validate=False)
+            for value in results)
+
+
+def dump_many(values, workers=None, chunk_size=CHUNK_SIZE):
+    """Serializes an iterable of DottedCollections or plain values in worker
+    processes and yields their JSON strings.
+    """
+    plain = (value._export() if hasattr(value, '_export') else value
+             for value in values)
+    return _map_chunks(_dump_chunk, _chunks(plain, chunk_size),
+                       (backends.get_backend(), ), workers)
@@ -0,0 +1,535 @@
+# -*- coding: utf-8 -*-
+"""A DottedDict stored in a SQLite file, for documents larger than memory.
+
+Every node of the document is a row keyed by its normalized path, the keys
+of the dotted path joined by SEPARATOR, so a subtree is a range scan of the
+primary key:
+
+    obj = SQLiteDottedDict('config.db')
+
+    obj['tenants.acme.flags'] = {'beta': True}
+    obj['tenants.acme.flags.beta']  # True
+    obj['tenants.acme'].to_python()  # a single range scan
+    obj.flush()
+
+Rows also keep the path of their parent, which is indexed, so listing the
+children of a node doesn't read its descendants.
+
+Nested dicts and lists are returned as views that read and write the same
+file. Leaf values are stored as JSON, so they must be JSON serializable.
+deep_merge(), apply_patch() and query() are not supported.
+Recently read nodes are kept in a bounded cache and writes are committed in
+batches of batch_size, or when flush() or close() are called.
+"""
+
+import collections
+import contextlib
+import sqlite3
+
+from six import iteritems, string_types as basestring
+
+from dotted import backends
+from dotted.collection import DottedCollection, DottedKeyError, \
+    _is_index, _key_parts
+
+
+# Joins the keys of a path. Keys can't contain it.
+SEPARATOR = '\x1f'
+# The character after SEPARATOR, the upper bound of subtree range scans
+_END = chr(ord(SEPARATOR) + 1)
+
+CACHE_SIZE = 1024
+BATCH_SIZE = 1000
+
+# Kinds of rows
+DICT = 'dict'
+LIST = 'list'
+VALUE = 'value'
+
+
+class _NodeCache(object):
+    """A bounded cache of rows by path that discards the least recently used
+    one when it gets full. A node and its cached descendants are discarded
+    together without looking at the other paths.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.rows = collections.OrderedDict()
+        # cached paths by parent path
+        self.children = {}
+
+    def get(self, path):
+        row = self.rows.pop(path, None)
+        if row is not None:
+            self.rows[path] = row
+        return row
+
+    def set(self, path, row):
+        if self.maxsize <= 0:
+            return
+        if self.rows.pop(path, None) is None:
+            self.children.setdefault(_parent(path), set()).add(path)
+        self.rows[path] = row
+        while len(self.rows) > self.maxsize:
+            self._discard(self.rows.popitem(last=False)[0])
+
+    def forget(self, path):
+        """Discards a node and its descendants"""
+        if self.rows.pop(path, None) is not None:
+            self._discard(path)
+        for child in list(self.children.get(path, ())):
+            self.forget(child)
+
+    def _discard(self, path):
+        parent = _parent(path)
+        siblings = self.children[parent]
+        siblings.discard(path)
+        if not siblings:
+            del self.children[parent]
+
+
+class _Database(object):
+    """The SQLite file shared by every view of a document. Paths are
+    normalized paths, and the root is the empty path.
+    """
+
+    def __init__(self, filename, cache_size, batch_size):
+        self.connection = sqlite3.connect(filename)
+        # the parent index lists the children of a node without reading
+        # its descendants
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS nodes (path TEXT PRIMARY KEY, '
+            'parent TEXT, kind TEXT NOT NULL, value TEXT) WITHOUT ROWID')
+        self.connection.execute(
+            'CREATE INDEX IF NOT EXISTS nodes_parent ON nodes (parent)')
+        # readers don't need a write lock
+        if self.connection.execute(
+                "SELECT 1 FROM nodes WHERE path = ''").fetchone() is None:
+            self.connection.execute(
+                'INSERT INTO nodes VALUES (?, NULL, ?, NULL)', ('', DICT))
+        self.connection.commit()
+
+        # (kind, value) by path
+        self.cache = _NodeCache(cache_size)
+        self.batch_size = batch_size
+        self.pending = 0
+
+    def node(self, path):
+        """Returns the (kind, value) pair of a node, or None if it does not
+        exist. Only leaf nodes have a value.
+        """
+        row = self.cache.get(path)
+        if row is None:
+            row = self.connection.execute(
+                'SELECT kind, value FROM nodes WHERE path = ?',
+                (path, )).fetchone()
+            if row is None:
+                return None
+            kind, value = row
+            row = (kind, backends.loads(value) if kind == VALUE else None)
+            self.cache.set(path, row)
+        return row
+
+    def children(self, path):
+        """Returns the keys of the children of a node, unsorted"""
+        start = len(path) + 1
+        return [child[start:] for child, in self.connection.execute(
+            'SELECT path FROM nodes WHERE parent = ?', (path, ))]
+
+    def count(self, path):
+        """Returns the number of children of a node"""
+        return self.connection.execute(
+            'SELECT count(*) FROM nodes WHERE parent = ?',
+            (path, )).fetchone()[0]
+
+    def load(self, path):
+        """Returns the plain value of a node, reading its descendants with a
+        single range scan.
+        """
+        kind, value = self.node(path)
+        if kind == VALUE:
+            return value
+
+        # list items are kept by index until every row is read, and nested
+        # containers as a tuple with their path
+        containers = {path: (kind, {})}
+        for child, kind, value in self.connection.execute(
+                'SELECT path, kind, value FROM nodes WHERE path >= ? '
+                'AND path < ?', (path + SEPARATOR, path + _END)):
+            parent, _, key = child.rpartition(SEPARATOR)
+            if kind == VALUE:
+                containers[parent][1][key] = backends.loads(value)
+            else:
+                containers[child] = (kind, {})
+                containers[parent][1][key] = (child, )
+
+        return _build(containers, path)
+
+    def put(self, path, value):
+        """Replaces a node and its descendants with a plain value. The old
+        value is kept if the new one can't be stored.
+        """
+        rows = []
+        _rows(path, _parent(path), value, rows)
+        with self.savepoint():
+            self.remove(path, count=False)
+            self.connection.executemany(
+                'INSERT INTO nodes VALUES (?, ?, ?, ?)', rows)
+        self.wrote()
+
+    @contextlib.contextmanager
+    def savepoint(self):
+        """Rolls back the writes of the block if it raises"""
+        # a savepoint outside a transaction would commit when released
+        if not self.connection.in_transaction:
+            self.connection.execute('BEGIN')
+        self.connection.execute('SAVEPOINT put')
+        try:
+            yield
+        except BaseException:
+            self.connection.execute('ROLLBACK TO put')
+            raise
+        finally:
+            self.connection.execute('RELEASE put')
+
+    def remove(self, path, count=True):
+        """Deletes a node and its descendants"""
+        self.connection.execute(
+            'DELETE FROM nodes WHERE path = ? OR path >= ? AND path < ?',
+            (path, path + SEPARATOR, path + _END))
+        self.forget(path)
+        if count:
+            self.wrote()
+
+    def move(self, old, new):
+        """Moves a node and its descendants to another path with the same
+        parent.
+        """
+        self.connection.execute(
+            'UPDATE nodes SET path = ? || substr(path, ?), parent = CASE '
+            'WHEN path = ? THEN parent ELSE ? || substr(parent, ?) END '
+            'WHERE path = ? OR path >= ? AND path < ?',
+            (new, len(old) + 1, old, new, len(old) + 1, old,
+             old + SEPARATOR, old + _END))
+        self.forget(old)
+        self.forget(new)
+        self.wrote()
+
+    def forget(self, path):
+        """Removes a node and its descendants from the cache"""
+        self.cache.forget(path)
+
+    def wrote(self):
+        """Counts a write, committing them if there are batch_size"""
+        self.pending += 1
+        if self.pending >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        self.connection.commit()
+        self.pending = 0
+
+
+def _rows(path, parent, value, rows):
+    """Adds the (path, parent, kind, value) rows of a plain value to rows"""
+    if isinstance(value, dict):
+        rows.append((path, parent, DICT, None))
+        for key, item in iteritems(value):
+            _rows(_join(path, key), path, item, rows)
+    elif isinstance(value, list):
+        rows.append((path, parent, LIST, None))
+        for index, item in enumerate(value):
+            _rows(_join(path, str(index)), path, item, rows)
+    else:
+        rows.append((path, parent, VALUE, backends.dumps(value)))
+
+
+def _parent(path):
+    return path.rpartition(SEPARATOR)[0]
+
+
+def _build(containers, path):
+    """Returns the plain value of a container read by _Database.load()"""
+    kind, items = containers[path]
+    for key, item in iteritems(items):
+        if isinstance(item, tuple):
+            items[key] = _build(containers, item[0])
+    if kind == DICT:
+        return items
+    return [items[key] for key in sorted(items, key=int)]
+
+
+def _join(path, key):
+    if SEPARATOR in key:
+        raise KeyError('{0!r} is not a valid key inside a '
+                       'SQLiteDottedDict'.format(key))
+    return path + SEPARATOR + key
+
+
+def _plain(value):
+    """Returns the validated plain value to store"""
+    value = DottedCollection.factory(value)
+    if isinstance(value, DottedCollection):
+        return value._export()
+    return value
+
+
+class _SQLiteCollection(DottedCollection):
+    """A view of a dict or list node of a SQLite document"""
+
+    __slots__ = ('_db', '_path')
+
+    @classmethod
+    def _view(cls, db, path):
+        node = cls.__new__(cls)
+        node._init(db, path)
+        return node
+
+    def _init(self, db, path):
+        # store is a property, the other slots of DottedCollection are unused
+        for name in ('_parent', '_plain', '_index'):
+            object.__setattr__(self, name, None)
+        object.__setattr__(self, '_lazy', False)
+        object.__setattr__(self, '_validate', True)
+        object.__setattr__(self, '_db', db)
+        object.__setattr__(self, '_path', path)
+
+    @property
+    def store(self):
+        """A plain copy of the node, read from the file"""
+        return self._export()
+
+    def _export(self, cache=False):
+        return self._db.load(self._path)
+
+    def to_python(self, copy=True):
+        """Returns a plain python copy of the node, read with a single range
+        scan.
+        """
+        return self._export()
+
+    def _node_path(self, key):
+        """Returns the normalized path of a key of this node"""
+        if isinstance(self, SQLiteDottedList):
+            if not _is_index(key):
+                raise IndexError('cannot use {0} as index in {1}'.format(
+                    key, self._path.replace(SEPARATOR, '.')[1:] or 'root'))
+            index = int(key)
+            if index < 0:
+                index += len(self)
+            key = str(index)
+        elif not isinstance(key, basestring):
+            raise KeyError('DottedDict keys must be str or unicode')
+        return _join(self._path, key)
+
+    def _wrap(self, path, row):
+        kind, value = row
+        if kind == DICT:
+            return SQLiteDottedDict._view(self._db, path)
+        elif kind == LIST:
+            return SQLiteDottedList._view(self._db, path)
+        return value
+
+    def _child(self, parts, i, action, create=False):
+        error = IndexError if isinstance(self, SQLiteDottedList) else KeyError
+        path = self._node_path(parts[i])
+        row = self._db.node(path)
+
+        if row is None and create:
+            if error is IndexError and int(parts[i]) != len(self):
+                raise IndexError('cannot {0} "{1}" in {2}'.format(
+                    action, ".".join(parts[i:]), parts[i]))
+            row = (LIST if str(parts[i + 1]).isdigit() else DICT, None)
+            self._db.put(path, [] if row[0] == LIST else {})
+        elif row is None:
+            raise error(parts[i])
+
+        if row[0] == VALUE:
+            raise error('cannot {0} "{1}" in "{2}" ({3})'.format(
+                action, ".".join(parts[i + 1:]), parts[i], repr(row[1])))
+
+        return self._wrap(path, row)
+
+    def _get_key(self, key):
+        path = self._node_path(key)
+        row = self._db.node(path)
+        if row is None:
+            raise (IndexError if isinstance(self, SQLiteDottedList)
+                   else KeyError)(key)
+        return self._wrap(path, row)
+
+    def _has_key(self, key):
+        try:
+            return self._db.node(self._node_path(key)) is not None
+        except (KeyError, IndexError):
+            return False
+
+    def __getitem__(self, key):
+        parts = _key_parts(key)
+        try:
+            # the normalized path of most keys is known without walking
+            path = self._path + ''.join(
+                SEPARATOR + part for part in parts)
+        except TypeError:
+            path = None
+        row = None if path is None else self._db.node(path)
+
+        if row is None:
+            # the right error or a list index like 01
+            return self._walk(parts, 'get')._get_key(parts[-1])
+        return self._wrap(path, row)
+
+    def __setitem__(self, key, value):
+        parts = _key_parts(key)
+        self._walk(parts, 'set', create=True)._set_key(parts[-1], value)
+
+    def __delitem__(self, key):
+        parts = _key_parts(key)
+        self._walk(parts, 'delete')._del_key(parts[-1])
+
+    def __len__(self):
+        return self._db.count(self._path)
+
+    def __repr__(self):
+        return repr(self._export())
+
+    def flush(self):
+        """Commits the pending writes"""
+        self._db.flush()
+
+    def close(self):
+        """Commits the pending writes and closes the file"""
+        self._db.flush()
+        self._db.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __copy__(self):
+        """Returns an in-memory copy"""
+        return DottedCollection.factory(self._export())
+
+    def __deepcopy__(self, memo):
+        return self.__copy__()
+
+    def __reduce__(self):
+        raise TypeError('SQLite collections can not be pickled')
+
+    def enable_index(self):
+        raise TypeError('SQLite collections can not be indexed')
+
+    enable_tracking = enable_index
+
+    # These walk the store of every node, which is a plain copy read from
+    # the file here
+
+    def _unsupported(self, *args, **kwargs):
+        raise TypeError('SQLite collections do not support this method, use '
+                        'an in-memory copy made with copy.copy()')
+
+    deep_merge = apply_patch = query = _unsupported
+
+    @classmethod
+    def from_flat(cls, items, lazy=False):
+        cls._unsupported(None)
+
+    def diff(self, other):
+        """Returns the operations that turn this node into other, reading
+        the node with a single range scan. See DottedCollection.diff().
+        """
+        return DottedCollection.factory(
+            self._export(), lazy=True, validate=False).diff(other)
+
+
+class SQLiteDottedList(_SQLiteCollection, collections.MutableSequence):
+    """A view of a list inside a SQLiteDottedDict"""
+
+    __slots__ = ()
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if isinstance(index, int):
+            return self._get_key(index)
+        return _SQLiteCollection.__getitem__(self, index)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self._get_key(index)
+
+    def _set_key(self, index, value):
+        path = self._node_path(index)
+        # the next index appends the value
+        if not 0 <= int(path.rpartition(SEPARATOR)[2]) <= len(self):
+            raise IndexError('list assignment index out of range')
+        self._db.put(path, _plain(value))
+
+    def _del_key(self, index):
+        path = self._node_path(index)
+        if self._db.node(path) is None:
+            raise IndexError('list assignment index out of range')
+        size = len(self)
+        self._db.remove(path)
+        # the following items are moved back
+        for i in range(int(path.rpartition(SEPARATOR)[2]) + 1, size):
+            self._db.move(_join(self._path, str(i)),
+                          _join(self._path, str(i - 1)))
+
+    def insert(self, index, value):
+        size = len(self)
+        start = slice(index, None).indices(size)[0]
+        for i in reversed(range(start, size)):
+            self._db.move(_join(self._path, str(i)),
+                          _join(self._path, str(i + 1)))
+        self._db.put(_join(self._path, str(start)), _plain(value))
+
+
+class SQLiteDottedDict(_SQLiteCollection, collections.MutableMapping):
+    """A DottedDict stored in a SQLite file. filename can be ':memory:' for a
+    temporary database.
+    """
+
+    __slots__ = ()
+
+    def __init__(self, filename=':memory:', initial=None,
+                 cache_size=CACHE_SIZE, batch_size=BATCH_SIZE):
+        self._init(_Database(filename, cache_size, batch_size), '')
+
+        if initial:
+            self.update(initial)
+            self.flush()
+
+    def __iter__(self):
+        return iter(self._db.children(self._path))
+
+    def __contains__(self, key):
+        try:
+            self[key]
+        except (KeyError, IndexError):
+            return False
+        return True
+
+    def _set_key(self, key, value):
+        self._db.put(self._node_path(key), _plain(value))
+
+    def _del_key(self, key):
+        path = self._node_path(key)
+        if self._db.node(path) is None:
+            raise KeyError(key)
+        self._db.remove(path)
+
+    def __getattr__(self, key):
+        try:
+            return self.__getitem__(key)
+        except KeyError as error:
+            raise DottedKeyError(*error.args)
+
+    def __setattr__(self, key, value):
+        self.__setitem__(key, value)
+
+    def __delattr__(self, key):
+        self.__delitem__(key)
@@ -0,0 +1,387 @@
+# -*- coding: utf-8 -*-
+"""Incremental JSON loading with path projection.
+
+The input is read in chunks and only the values below the requested dotted
+paths are kept, so memory is bounded by the projected data instead of the
+size of the document:
+
+    obj = load(open('huge.json', 'rb'), paths=['meta', 'items.0.name'])
+
+Kept values are recognised by scanning the raw text for their boundaries and
+decoded in a single call to the JSON backend. Skipped values are only scanned, so
+they are not fully validated.
+
+JSON Lines documents are read and written one record at a time:
+
+    for record in iter_lines(open('events.jsonl', 'rb'), lazy=True):
+        ...
+
+    dump_lines(records, open('copy.jsonl', 'wb'))
+"""
+
+import codecs
+import io
+import re
+
+from json.decoder import scanstring
+
+from six import binary_type, text_type
+
+from dotted import backends
+from dotted.collection import DottedCollection, parse_key
+
+
+CHUNK_SIZE = 65536
+# Records joined in every write of dump_lines()
+WRITE_BATCH = 1000
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+# Characters of a string up to its closing quote
+_STRING_BODY = re.compile(r'(?:[^"\\]|\\.)*', re.DOTALL)
+_NUMBER = re.compile(r'-?(?:0|[1-9][0-9]*)(?:\.[0-9]+)?(?:[eE][-+]?[0-9]+)?')
+# Characters that can continue a number
+_NUMBER_CHARS = re.compile(r'[0-9.eE+-]*')
+_STRUCTURE = re.compile(r'["\[\]{}]')
+_LITERALS = ('true', 'false', 'null')
+
+# Returned when a requested container is missing in the document
+_ABSENT = object()
+
+
+def _iter_chunks(source, chunk_size):
+    """Yields the text chunks of a file object, a string or an iterable of
+    bytes or text chunks.
+    """
+    if isinstance(source, (binary_type, text_type)):
+        chunks = iter([source])
+    elif hasattr(source, 'read'):
+        chunks = iter(lambda: source.read(chunk_size), source.read(0))
+    else:
+        chunks = iter(source)
+
+    decoder = codecs.getincrementaldecoder('utf-8')()
+
+    for chunk in chunks:
+        if isinstance(chunk, binary_type):
+            chunk = decoder.decode(chunk)
+        if chunk:
+            yield chunk
+
+    tail = decoder.decode(b'', final=True)
+    if tail:
+        yield tail
+
+
+def projection(paths):
+    """Returns a trie of nested dicts for a list of dotted paths. None marks
+    a subtree that must be kept entirely.
+    """
+    if paths is None:
+        return None
+
+    trie = {}
+
+    for path in paths:
+        parts = parse_key(path).parts
+        node = trie
+        for part in parts[:-1]:
+            child = node.get(part, {})
+            if child is None:  # a shorter path already keeps everything
+                break
+            node = node.setdefault(part, child)
+        else:
+            node[parts[-1]] = None
+
+    return trie
+
+
+class _Reader(object):
+    """Reads JSON tokens from a stream of text chunks"""
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+        # Text of the value being captured that is no longer in buf
+        self.pieces = None
+        self.mark = 0
+
+    def fill(self):
+        """Reads one more chunk. Returns False at the end of the input"""
+        if self.eof:
+            return False
+
+        try:
+            chunk = next(self.chunks)
+        except StopIteration:
+            self.eof = True
+            return False
+
+        if self.pieces is not None:
+            self.pieces.append(self.buf[self.mark:self.pos])
+            self.mark = 0
+
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def error(self, message):
+        return ValueError('{0} at position {1} of the current chunk'.format(
+            message, self.pos))
+
+    def peek(self):
+        """Skips whitespace and returns the next character, or '' at the end
+        of the input.
+        """
+        while True:
+            self.pos = _WHITESPACE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self.fill():
+                return ''
+
+    def expect(self, chars):
+        char = self.peek()
+        if not char or char not in chars:
+            raise self.error('Expecting one of {0!r}'.format(chars))
+        self.pos += 1
+        return char
+
+    def skip_string(self, text=False):
+        """Moves past the next string. Returns its raw text if text is True.
+        Strings split across chunks are scanned once, and the scanned text is
+        only kept if it's returned or captured.
+        """
+        start = self.pos
+        self.pos += 1
+        pieces = []
+
+        while True:
+            end = _STRING_BODY.match(self.buf, self.pos).end()
+            if end < len(self.buf) and self.buf[end] == '"':
+                self.pos = end + 1
+                if text:
+                    pieces.append(self.buf[start:self.pos])
+                    return ''.join(pieces)
+                return None
+
+            # the scan resumes at the end of the chunk, or at a trailing
+            # backslash that escapes the first character of the next one
+            if text:
+                pieces.append(self.buf[start:end])
+            self.pos = end
+            start = 0
+            if not self.fill():
+                raise self.error('Unterminated string')
+
+    def skip_scalar(self):
+        while True:
+            match = _NUMBER.match(self.buf, self.pos)
+            if match is not None and match.end() > self.pos:
+                # numbers can continue in the next chunk, even after a
+                # shorter valid number like 1. or 1e
+                end = _NUMBER_CHARS.match(self.buf, match.end()).end()
+                if end < len(self.buf) or self.eof:
+                    self.pos = match.end()
+                    return
+            elif len(self.buf) - self.pos >= 5 or self.eof:
+                for literal in _LITERALS:
+                    if self.buf.startswith(literal, self.pos):
+                        self.pos += len(literal)
+                        return
+                raise self.error('Expecting value')
+            self.fill()
+
+    def skip(self):
+        """Moves past the next value without decoding it"""
+        char = self.peek()
+
+        if char == '"':
+            self.skip_string()
+        elif char in ('[', '{'):
+            depth = 0
+            while True:
+                match = _STRUCTURE.search(self.buf, self.pos)
+                if match is None:
+                    self.pos = len(self.buf)
+                    if not self.fill():
+                        raise self.error('Unterminated container')
+                    continue
+
+                char = match.group()
+                self.pos = match.start()
+                if char == '"':
+                    self.skip_string()
+                    continue
+
+                self.pos += 1
+                depth += 1 if char in '[{' else -1
+                if depth == 0:
+                    return
+        elif char:
+            self.skip_scalar()
+        else:
+            raise self.error('Expecting value')
+
+    def capture(self):
+        """Returns the next value, decoded"""
+        self.peek()
+        self.pieces = []
+        self.mark = self.pos
+        try:
+            self.skip()
+            self.pieces.append(self.buf[self.mark:self.pos])
+            text = ''.join(self.pieces)
+        finally:
+            self.pieces = None
+        return backends.loads(text)
+
+    def value(self, trie):
+        """Returns the next value keeping only the paths in trie"""
+        if trie is None:
+            return self.capture()
+
+        char = self.peek()
+
+        if char == '{':
+            self.pos += 1
+            result = {}
+            if self.peek() == '}':
+                self.pos += 1
+                return result
+
+            while True:
+                if self.peek() != '"':
+                    raise self.error('Expecting property name')
+                key = scanstring(self.skip_string(text=True), 1)[0]
+                self.expect(':')
+
+                if key in trie:
+                    value = self.value(trie[key])
+                    if value is not _ABSENT:
+                        result[key] = value
+                else:
+                    self.skip()
+
+                if self.expect(',}') == '}':
+                    return result
+
+        elif char == '[':
+            self.pos += 1
+            result = []
+            if self.peek() == ']':
+                self.pos += 1
+                return result
+
+            index = 0
+            skipped = 0
+            while True:
+                key = str(index)
+                if key in trie:
+                    value = self.value(trie[key])
+                    # skipped items are None so indexes are preserved
+                    result.extend([None] * skipped)
+                    result.append(None if value is _ABSENT else value)
+                    skipped = 0
+                else:
+                    self.skip()
+                    skipped += 1
+
+                index += 1
+                if self.expect(',]') == ']':
+                    return result
+
+        self.skip()
+        return _ABSENT
+
+
+def load_projected(source, paths=None, chunk_size=CHUNK_SIZE):
+    """Returns the plain python value of a JSON document read from source,
+    that can be a file object, a string or an iterable of bytes or text
+    chunks. If paths is given only the values below those dotted paths and
+    the containers leading to them are kept. Raises ValueError for invalid
+    JSON.
+    """
+    reader = _Reader(_iter_chunks(source, chunk_size))
+    result = reader.value(projection(paths))
+
+    if reader.peek():
+        raise reader.error('Extra data')
+    if result is _ABSENT:
+        raise ValueError('The document has none of the requested paths')
+    return result
+
+
+def load(source, paths=None, lazy=False, validate=True,
+         chunk_size=CHUNK_SIZE):
+    """Returns a DottedCollection from a JSON document read incrementally
+    from source. See load_projected().
+    """
+    return DottedCollection.factory(
+        load_projected(source, paths, chunk_size),
+        lazy=lazy, validate=validate)
+
+
+def iter_lines(source, lazy=False, validate=True, chunk_size=CHUNK_SIZE):
+    """Yields a DottedCollection for every line of a JSON Lines document read
+    from source, see load_projected(). Blank lines are skipped. If lazy is
+    True the nested values of each record are wrapped on first access.
+    """
+    # pieces of the current line, joined when its newline arrives so long
+    # lines are not copied on every chunk
+    tail = []
+    number = 0
+
+    for chunk in _iter_chunks(source, chunk_size):
+        tail.append(chunk)
+        if '\n' not in chunk:
+            continue
+        lines = ''.join(tail).split('\n')
+        tail = [lines.pop()]
+        for line in lines:
+            number += 1
+            if line.strip():
+                yield _load_line(line, number, lazy, validate)
+
+    tail = ''.join(tail)
+    if tail.strip():
+        yield _load_line(tail, number + 1, lazy, validate)
+
+
+def _load_line(line, number, lazy, validate):
+    try:
+        value = backends.loads(line)
+    except ValueError as error:
+        raise ValueError('Invalid JSON in line {0}: {1}'.format(
+            number, error))
+    return DottedCollection.factory(value, lazy=lazy, validate=validate)
+
+
+def dump_lines(records, target, batch=WRITE_BATCH):
+    """Writes an iterable of DottedCollections or plain values to a text or
+    binary file object as JSON Lines, joining batch records in every write.
+    """
+    # backends can return bytes or text on Python 2
+    if isinstance(target, io.TextIOBase):
+        def write(text):
+            if isinstance(text, binary_type):
+                text = text.decode('utf-8')
+            target.write(text)
+    else:
+        def write(text):
+            if isinstance(text, text_type):
+                text = text.encode('utf-8')
+            target.write(text)
+
+    lines = []
+    for record in records:
+        # cheaper than an isinstance() check against the ABC
+        export = getattr(record, '_export', None)
+        lines.append(backends.dumps(record if export is None else export()))
+        if len(lines) == batch:
+            write('\n'.join(lines) + '\n')
+            lines = []
+
+    if lines:
+        write('\n'.join(lines) + '\n')
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+import json
+
+import unittest2 as unittest
+
+from dotted import backends
+from dotted.collection import DottedCollection
+
+
+class BackendsTests(unittest.TestCase):
+
+    def setUp(self):
+        self.backend = backends.get_backend()
+
+    def tearDown(self):
+        backends.set_backend(self.backend)
+
+    def test_available_backends(self):
+        names = backends.available_backends()
+        self.assertIn('json', names)
+
+        backends.set_backend()
+        self.assertEqual(backends.get_backend(), 'json')
+        backends.set_backend('auto')
+        self.assertEqual(
+            backends.get_backend(),
+            [name for name in backends.PREFERENCE if name in names][0])
+
+        with self.assertRaises(ValueError):
+            backends.set_backend('missing')
+
+        data = {"a": [1, 2.5, {"b": None, "c": True}], "d": u"é"}
+
+        for name in names:
+            backends.set_backend(name)
+            obj = DottedCollection.load_json(json.dumps(data))
+            self.assertEqual(obj.to_python(), data)
+            self.assertEqual(json.loads(obj.to_json()), data)
+            self.assertEqual(json.loads(obj['a.2'].to_json()), data['a'][2])
+
+            with self.assertRaises(ValueError):
+                DottedCollection.load_json('{"key": "value"')
+
+            # no backend changes values
+            text = '{"a": 123456789012345678901234567890, "b": -1}'
+            self.assertEqual(DottedCollection.load_json(text).to_python(),
+                             {'a': 123456789012345678901234567890, 'b': -1})
+            obj = DottedCollection.factory({'a': [2 ** 70, None]})
+            self.assertEqual(json.loads(obj.to_json()), obj.to_python())
+            obj = DottedCollection.factory({'a': float('nan'), 'b': None})
+            value = DottedCollection.load_json(obj.to_json())
+            self.assertNotEqual(value['a'], value['a'])
+            self.assertIsNone(value['b'])
+            self.assertEqual(backends.loads('[Infinity]'), [float('inf')])
+            self.assertEqual(json.loads(backends.dumps({1: 2})), {'1': 2})
+            with self.assertRaises(TypeError):
+                backends.dumps({'a': object()})
+
+    def test_register_backend(self):
+        calls = []
+
+        def dumps(value):
+            calls.append(value)
+            return json.dumps(value, sort_keys=True)
+
+        backends.register_backend('sorted', json.loads, dumps)
+        backends.set_backend('sorted')
+
+        obj = DottedCollection.factory({'b': 1, 'a': {'c': [2]}})
+        self.assertEqual(obj.to_json(), '{"a": {"c": [2]}, "b": 1}')
+        # nested nodes are given to the backend as plain python values
+        self.assertEqual(calls, [{'b': 1, 'a': {'c': [2]}}])
+        self.assertIs(type(calls[0]['a']), dict)
+
+
+if __name__ == '__main__':
+    unittest.main()
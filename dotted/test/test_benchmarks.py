@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+import unittest2 as unittest
+
+from dotted.benchmarks import core
+from dotted.benchmarks.__main__ import compare
+from dotted.collection import DottedCollection
+
+
+class BenchmarksTests(unittest.TestCase):
+
+    def test_document(self):
+        data, paths = core.document(width=4, depth=3, escaped=0.5)
+        obj = DottedCollection.factory(data)
+
+        self.assertEqual(len(paths), 4)
+        self.assertTrue(any('\\.' in path for path in paths))
+        for path in paths:
+            self.assertEqual(obj[path], 'leaf')
+
+    def test_run(self):
+        results = core.run(width=2, depth=2, escaped=0, number=1)
+
+        self.assertIn('get', results)
+        self.assertIn('attribute_access', results)
+        self.assertTrue(all(value >= 0 for value in results.values()))
+
+    def test_compare(self):
+        comparison, regressions = compare(
+            {'get': 2.0, 'set': 1.0, 'new': 1.0},
+            {'get': 1.0, 'set': 1.0, 'old': 1.0},
+            threshold=0.1)
+
+        self.assertEqual(sorted(comparison), ['get', 'set'])
+        self.assertEqual(comparison['get']['ratio'], 2.0)
+        self.assertEqual(regressions, ['get'])
+
+
+if __name__ == '__main__':
+    unittest.main()
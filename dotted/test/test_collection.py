@@ -1,10 +1,16 @@
 # -*- coding: utf-8 -*-
+import array
+import copy
 import json
+import pickle
 
-from six import string_types, text_type
+from six import PY3, iteritems, string_types, text_type
 import unittest2 as unittest
 
-from dotted.collection import DottedCollection, DottedList, DottedDict
+from dotted.collection import DottedCollection, DottedList, DottedDict, \
+    DottedKeyError, DottedPath, FrozenDottedDict, FrozenDottedList, \
+    compile_getter, compile_getters, compile_query, compile_setter, freeze, \
+    parse_key, set_path_cache_size, PATH_CACHE_SIZE
 
 
 class DottedCollectionTests(unittest.TestCase):
@@ -433,6 +439,932 @@ class DottedCollectionTests(unittest.TestCase):
             DottedCollection.load_json('{"key": "value"')
         with self.assertRaises(ValueError):
             DottedCollection.load_json('value')
+        with self.assertRaises(ValueError):
+            DottedCollection.factory({"a": [{"b": [{"bad.key": 1}]}]})
+
+    def test_no_validation(self):
+        """Trusted data can skip validation"""
+        data = {"a": [{"b": {"c": 1}}], "d": 2}
+        obj = DottedCollection.factory(data, validate=False)
+
+        self.assertIsInstance(obj["a.0.b"], DottedDict)
+        self.assertEqual(obj.to_python(), data)
+
+        obj = DottedCollection.load_json('{"a": {"b": 1}}', validate=False)
+        self.assertEqual(obj["a.b"], 1)
+
+    def test_dotted_path(self):
+        """DottedPath Tests"""
+        path = DottedPath(r"facets.d\.o\. origen.0")
+
+        self.assertEqual(path.parts, ("facets", r"d\.o\. origen", "0"))
+        self.assertEqual(path.head, "facets")
+        self.assertEqual(path.tail, r"d\.o\. origen.0")
+        self.assertEqual(path, r"facets.d\.o\. origen.0")
+        self.assertEqual(str(path), r"facets.d\.o\. origen.0")
+        self.assertEqual(DottedPath.from_parts(["hello", 0]), "hello.0")
+        self.assertEqual(hash(DottedPath("a.b")), hash("a.b"))
+
+        obj = DottedCollection.factory(
+            {"facets": {r"d\.o\. origen": ["rioja", "bierzo"]}})
+
+        self.assertEqual(obj[path], "rioja")
+        self.assertTrue(DottedPath(r"facets.d\.o\. origen") in obj)
+        self.assertEqual(obj["facets"][path.tail], "rioja")
+
+        obj[DottedPath("hello.0.world")] = "web"
+        self.assertIsInstance(obj.hello, DottedList)
+        self.assertEqual(obj["hello.0.world"], "web")
+
+        del obj[DottedPath("hello.0.world")]
+        self.assertReprsEqual(repr(obj.hello), "[{}]")
+
+    def test_deep_paths(self):
+        """Mixed dict/list paths are walked in a single pass"""
+        obj = DottedCollection.factory(
+            {'hello': [{'world': {'wide': ['web']}}], 'text': 'plain'})
+
+        self.assertEqual(obj['hello.0.world.wide.0'], 'web')
+        self.assertEqual(obj['hello']['0.world.wide.0'], 'web')
+        self.assertEqual(obj['hello.0']['world.wide.0'], 'web')
+
+        self.assertTrue('hello.0.world.wide.0' in obj)
+        self.assertTrue('hello.0.world' in obj)
+        self.assertFalse('hello.0.world.wide.1' in obj)
+        self.assertFalse('hello.1.world' in obj)
+        self.assertFalse('missing.path' in obj)
+        self.assertFalse('text.path' in obj)
+
+        with self.assertRaisesRegexp(KeyError, 'cannot get "path" in "text"'):
+            obj['text.path']
+
+        with self.assertRaisesRegexp(
+                IndexError,
+                'cannot get "wide" in "0"'):
+            DottedList([1])['0.wide']
+
+        with self.assertRaisesRegexp(KeyError, 'cannot set "a" in "text"'):
+            obj['text.a'] = 1
+
+        obj['hello.0.world.wide.1'] = 'web'
+        obj['hello.1.new.0.path'] = True
+
+        self.assertReprsEqual(
+            repr(obj['hello']),
+            "[{'world': {'wide': ['web', 'web']}}, {'new': [{'path': True}]}]"
+        )
+        self.assertIsInstance(obj['hello.1.new'], DottedList)
+
+        del obj['hello.0.world.wide.0']
+        del obj['hello.1.new.0.path']
+
+        self.assertReprsEqual(
+            repr(obj['hello']),
+            "[{'world': {'wide': ['web']}}, {'new': [{}]}]"
+        )
+
+        with self.assertRaisesRegexp(
+                KeyError,
+                'cannot delete "a" in "text"'):
+            del obj['text.a']
+
+    def test_lazy(self):
+        """Lazy collections behave like eager ones"""
+        data = {'hello': [{'world': {'wide': ['web']}}, [1, 2]],
+                'facets': {r'd\.o\. origen': ['rioja']}}
+
+        obj = DottedCollection.factory(data, lazy=True)
+        eager = DottedCollection.factory(data)
+
+        self.assertIsInstance(obj, DottedDict)
+        self.assertIsInstance(obj.store['hello'], list)  # not wrapped yet
+
+        self.assertIsInstance(obj['hello'], DottedList)
+        self.assertIsInstance(obj.store['hello'], DottedList)  # memoized
+        self.assertIs(obj['hello'], obj['hello'])
+        self.assertIsInstance(obj['hello'].store[0], dict)
+
+        self.assertEqual(obj['hello.0.world.wide.0'], 'web')
+        self.assertIsInstance(obj['hello.0.world'], DottedDict)
+        self.assertEqual(obj.facets[r'd\.o\. origen'][0], 'rioja')
+        self.assertEqual(obj['facets'].to_python(),
+                         eager['facets'].to_python())
+
+        for lazy_item, eager_item in zip(obj['hello'], eager['hello']):
+            self.assertIsInstance(lazy_item, DottedCollection)
+            self.assertEqual(type(lazy_item), type(eager_item))
+
+        self.assertIsInstance(obj['hello'][1:][0], DottedList)
+        self.assertIsInstance(dict(obj.items())['facets'], DottedDict)
+
+        for target in (obj, eager):
+            target['hello.1.2'] = {'new': [3]}
+            target['hello'].insert(0, {'first': True})
+            target['added.0.path'] = 'value'
+            del target['hello.1.world.wide']
+
+        self.assertIsInstance(obj['hello.2.2.new'], DottedList)
+        self.assertIsInstance(obj['hello.0'], DottedDict)
+        self.assertEqual(obj.to_python(), eager.to_python())
+        self.assertEqual(json.loads(obj.to_json()), json.loads(eager.to_json()))
+
+        # Original data is never modified
+        self.assertEqual(data['hello'], [{'world': {'wide': ['web']}}, [1, 2]])
+
+        obj = DottedCollection.load_json('{"a": {"bad.key": 1}}', lazy=True)
+        with self.assertRaises(ValueError):
+            obj['a']
+
+        # Trusted data is not validated at any level
+        obj = DottedCollection.factory(
+            {'a': [{'b': {'bad.key': 1}}]}, lazy=True, validate=False)
+        self.assertEqual(obj['a.0.b'].to_python(), {'bad.key': 1})
+        with self.assertRaises(ValueError):
+            obj['a.0'].set_many({'c': {'bad.key': 1}})
+
+    def test_many(self):
+        """get_many, set_many and delete_many Tests"""
+        obj = DottedCollection.factory(
+            {'hello': [{'world': {'wide': 'web'}}, 1, 2, 3], 'bye': 'world'})
+
+        self.assertEqual(
+            obj.get_many(['hello.0.world.wide', 'bye', 'hello.2', 'bye']),
+            ['web', 'world', 2, 'world'])
+        self.assertIsInstance(obj.get_many(['hello.0'])[0], DottedDict)
+
+        with self.assertRaises(KeyError):
+            obj.get_many(['bye', 'missing.key'])
+        with self.assertRaises(IndexError):
+            obj.get_many(['hello.9'])
+
+        self.assertEqual(
+            obj.get_many(['missing.key', 'hello.9.a', 'bye.a', 'bye'],
+                         default=None),
+            [None, None, None, 'world'])
+
+        obj.set_many([
+            ('hello.0.world.wide', 'tour'),
+            ('hello.4', 4),
+            ('new.0.path', {'a': 1}),
+            ('new.0.path.b', 2),
+            ('other.path', 1),
+            ('other', {'replaced': True}),
+            ('other.extra', [1]),
+        ])
+
+        self.assertReprsEqual(
+            repr(obj),
+            "{'hello': [{'world': {'wide': 'tour'}}, 1, 2, 3, 4], "
+            "'bye': 'world', 'new': [{'path': {'a': 1, 'b': 2}}], "
+            "'other': {'replaced': True, 'extra': [1]}}")
+        self.assertIsInstance(obj['new'], DottedList)
+        self.assertIsInstance(obj['new.0.path'], DottedDict)
+        self.assertIsInstance(obj['other.extra'], DottedList)
+
+        obj.set_many({'bye': 'again'})
+        self.assertEqual(obj.bye, 'again')
+
+        with self.assertRaisesRegexp(KeyError, 'cannot set "a" in "bye"'):
+            obj.set_many([('bye.a', 1)])
+        with self.assertRaisesRegexp(KeyError, 'must be str or unicode'):
+            obj.set_many([(1, 1)])
+
+        # indexes refer to the list before deleting anything
+        obj.delete_many(['hello.1', 'hello.3', 'hello.0.world.wide',
+                         'other', 'other.extra', 'new.0.path.a'])
+
+        self.assertReprsEqual(
+            repr(obj),
+            "{'hello': [{'world': {}}, 2, 4], 'bye': 'again', "
+            "'new': [{'path': {'b': 2}}]}")
+
+        with self.assertRaises(KeyError):
+            obj.delete_many(['missing'])
+
+        obj = DottedList([[0, 1, 2], [3], 4])
+        obj.set_many([('0.3', 3), (1, 'one')])
+        self.assertEqual(obj.get_many([1, '0.3', '0']), ['one', 3, obj[0]])
+
+        obj.delete_many([-1, 0])
+        self.assertReprsEqual(repr(obj), "['one']")
+
+    def test_slots(self):
+        """Nodes have no instance __dict__"""
+        obj = DottedCollection.factory({'hello': [{'world': 'wide'}]})
+
+        # the ABCs of Python 2 have no __slots__, so nodes have a __dict__
+        if PY3:
+            for node in (obj, obj.hello, obj.hello[0]):
+                self.assertEqual(type(node).__dictoffset__, 0)
+
+        obj.hello[0].world = 'web'
+        self.assertEqual(obj['hello.0.world'], 'web')
+        self.assertReprsEqual(repr(obj), "{'hello': [{'world': 'web'}]}")
+
+        obj.store = {'replaced': True}
+        self.assertReprsEqual(repr(obj), "{'replaced': True}")
+
+        # the other slots are not attributes
+        obj._index = 3
+        obj._parent = 4
+        obj['x'] = 1
+        self.assertEqual(obj.to_python(),
+                         {'replaced': True, '_index': 3, '_parent': 4, 'x': 1})
+        del obj._index
+        self.assertNotIn('_index', obj)
+
+    def test_cached_export(self):
+        """to_python(copy=False) Tests"""
+        obj = DottedCollection.factory(
+            {'hello': [{'world': {'wide': 'web'}}], 'bye': {'a': 1}})
+
+        plain = obj.to_python(copy=False)
+        self.assertEqual(plain, obj.to_python())
+        self.assertIs(obj.to_python(copy=False), plain)
+        self.assertIs(obj.hello.to_python(copy=False), plain['hello'])
+        self.assertIsNot(obj.to_python(), obj.to_python())
+
+        obj.hello[0].world.wide = 'tour'
+
+        new_plain = obj.to_python(copy=False)
+        self.assertIsNot(new_plain, plain)
+        self.assertEqual(new_plain['hello'][0]['world']['wide'], 'tour')
+        # untouched subtrees are still shared
+        self.assertIs(new_plain['bye'], plain['bye'])
+
+        for change in (lambda: obj.hello.append({'x': 1}),
+                       lambda: obj.set_many([('new.0.path', 1)]),
+                       lambda: obj['hello.1'].update({'y': 2}),
+                       lambda: obj.delete_many(['bye.a']),
+                       lambda: obj['hello'].pop()):
+            plain = obj.to_python(copy=False)
+            change()
+            self.assertIsNot(obj.to_python(copy=False), plain)
+            self.assertEqual(obj.to_python(copy=False), obj.to_python())
+
+        # serializing does not keep a plain copy
+        obj = DottedCollection.factory({'a': {'b': [1, {'c': 2}]}})
+        obj.to_json()
+        pickle.dumps(obj)
+        copy.copy(obj)
+        for node in (obj, obj.a, obj['a.b'], obj['a.b.1']):
+            self.assertIsNone(node._plain)
+        self.assertIs(obj.a.to_python(copy=False), obj.a._plain)
+        self.assertIsNone(obj._plain)
+        self.assertEqual(json.loads(obj.to_json()),
+                         {'a': {'b': [1, {'c': 2}]}})
+
+        data = {'a': {'b': [1, {'c': 2}]}}
+        obj = DottedCollection.factory(data, lazy=True)
+        self.assertIs(obj.a.to_python(copy=False), data['a'])  # zero copy
+
+        plain = obj.to_python(copy=False)
+        obj['a.b.1.c'] = 3
+        self.assertEqual(obj.to_python(copy=False), {'a': {'b': [1, {'c': 3}]}})
+        self.assertEqual(data, {'a': {'b': [1, {'c': 2}]}})
+
+        # collections given as values are adopted
+        for lazy in (False, True):
+            inner = DottedDict({'y': 1})
+            obj = DottedDict({'x': inner}, lazy=lazy)
+            obj.to_json()
+            inner['y'] = 3
+            self.assertEqual(obj.to_json(), '{"x": {"y": 3}}')
+            self.assertEqual(DottedList([inner]).to_json(), '[{"y": 3}]')
+
+        # a node already inside a tree is copied into another one
+        a = DottedDict({'x': {'y': 1}})
+        b = DottedDict()
+        a.to_json()
+        b['x'] = a['x']
+        self.assertIsNot(b['x'], a['x'])
+        a['x']['y'] = 2
+        b['x']['y'] = 3
+        self.assertEqual(a.to_json(), '{"x": {"y": 2}}')
+        self.assertEqual(b.to_json(), '{"x": {"y": 3}}')
+        a['z'] = a['x']
+        a['z.y'] = 4
+        self.assertEqual(a.to_python(), {'x': {'y': 2}, 'z': {'y': 4}})
+
+    def test_flatten(self):
+        """flatten, iterflatten and from_flat Tests"""
+        data = {'a': [{'b': 1, r'c\.d': {}}, [], 3], 'e': 'x',
+                'f': {'g': {'h': None}}}
+        flat = {'a.0.b': 1, r'a.0.c\.d': {}, 'a.1': [], 'a.2': 3, 'e': 'x',
+                'f.g.h': None}
+
+        for lazy in (False, True):
+            obj = DottedCollection.factory(data, lazy=lazy)
+            self.assertEqual(obj.flatten(), flat)
+            self.assertEqual(sorted(obj.iterflatten()), sorted(flat.items()))
+            self.assertEqual(obj['a'].flatten(),
+                             {'0.b': 1, r'0.c\.d': {}, '1': [], '2': 3})
+
+            for key, value in obj.iterflatten():
+                if not isinstance(value, (dict, list)):
+                    self.assertEqual(obj[key], value)
+
+        obj = DottedDict.from_flat(sorted(flat.items()))
+        self.assertIsInstance(obj, DottedDict)
+        self.assertIsInstance(obj['a'], DottedList)
+        self.assertIsInstance(obj['a.0'], DottedDict)
+        self.assertIsInstance(obj['a.1'], DottedList)
+        self.assertEqual(obj.to_python(), data)
+        self.assertEqual(DottedDict.from_flat(flat).to_python(), data)
+
+        obj = DottedList.from_flat([('0.a', 1), ('1', 2), ('2.0.x', 3)])
+        self.assertReprsEqual(repr(obj), "[{'a': 1}, 2, [{'x': 3}]]")
+
+        # later keys replace the nodes created for previous ones
+        obj = DottedDict.from_flat(
+            [('a.b', 1), ('a', {'c': 2}), ('a.d', 3), ('e.f', 4)])
+        self.assertReprsEqual(repr(obj), "{'a': {'c': 2, 'd': 3}, "
+                                         "'e': {'f': 4}}")
+
+        with self.assertRaises(IndexError):
+            DottedDict.from_flat([('a.1', 1)])
+        with self.assertRaises(ValueError):
+            DottedDict.from_flat([('a', {'bad.key': 1})])
+
+    def test_index(self):
+        """enable_index Tests"""
+
+        def check(obj):
+            # indexed values are the ones found by walking their paths
+            for key, value in list(iteritems(obj._index.values)):
+                parts = parse_key(key).parts
+                node = obj._walk(parts, 'get')
+                self.assertIs(node.store[int(parts[-1]) if isinstance(
+                    node, DottedList) else parts[-1]], value)
+            if not obj._lazy:
+                for key, value in obj.iterflatten():
+                    self.assertIn(key, obj._index.values)
+
+        for lazy in (False, True):
+            obj = DottedCollection.factory(
+                {'a': {'b': [{'c': 1}, {'c': 2}]}, r'd\.e': {'f': 3}},
+                lazy=lazy)
+            obj.enable_index()
+            check(obj)
+
+            self.assertEqual(obj['a.b.1.c'], 2)
+            self.assertEqual(obj[r'd\.e.f'], 3)
+            self.assertEqual(obj['a.b'][0]['c'], 1)
+            self.assertIn('a.b.0.c', obj)
+            self.assertNotIn('a.b.2', obj)
+            check(obj)
+
+            obj['a.b.1.c'] = 4
+            obj.a.x = {'y': [5]}
+            obj['new.0.path'] = 6
+            obj['a.b'].insert(0, {'c': 0})
+            obj['a.b'].append({'c': 7})
+            self.assertEqual(obj['a.b.0.c'], 0)
+            self.assertEqual(obj['a.b.2.c'], 4)
+            self.assertEqual(obj['a.x.y.0'], 5)
+            self.assertEqual(obj['new.0.path'], 6)
+            check(obj)
+
+            del obj['a.b.0']
+            obj['a.b'].pop()
+            old = obj['a.x']
+            obj.a.x = 'z'
+            self.assertEqual(obj['a.b.1.c'], 4)
+            self.assertNotIn('a.b.2', obj)
+            self.assertEqual(obj['a.x'], 'z')
+            with self.assertRaises(KeyError):
+                obj['a.x.y']
+            check(obj)
+
+            # removed nodes are no longer indexed
+            self.assertIsNone(old._index)
+            old['y'] = 8
+            self.assertNotIn('a.x.y', obj)
+
+            obj.set_many([('a.b.0.c', 9), ('g.h', 10)])
+            obj.delete_many([r'd\.e.f'])
+            self.assertEqual(obj['a.b.0.c'], 9)
+            check(obj)
+
+            obj.disable_index()
+            self.assertIsNone(obj._index)
+            self.assertIsNone(obj['a.b.0']._index)
+            self.assertEqual(obj['g.h'], 10)
+
+        obj = DottedList([{'a': [1]}, 2])
+        obj.enable_index()
+        self.assertEqual(obj['0.a.0'], 1)
+        obj[-1] = 3
+        del obj[0]
+        self.assertEqual(obj['0'], 3)
+        check(obj)
+
+    def test_query(self):
+        """query Tests"""
+        data = {'orders': [
+            {'id': 1, 'items': [{'sku': 'a'}, {'sku': 'b'}]},
+            {'id': 2, 'items': [{'sku': 'c', 'extra': {'sku': 'd'}}]},
+            {'id': 3},
+        ], r'x\.y': {'*': 1, 'z': 2}}
+
+        for lazy in (False, True):
+            obj = DottedCollection.factory(data, lazy=lazy)
+
+            self.assertEqual(list(obj.query('orders.*.items.*.sku')), [
+                ('orders.0.items.0.sku', 'a'), ('orders.0.items.1.sku', 'b'),
+                ('orders.1.items.0.sku', 'c')])
+            self.assertEqual(list(obj.query('orders.**.sku')), [
+                ('orders.0.items.0.sku', 'a'), ('orders.0.items.1.sku', 'b'),
+                ('orders.1.items.0.sku', 'c'),
+                ('orders.1.items.0.extra.sku', 'd')])
+            self.assertEqual(sorted(obj.query('**.id')), [
+                ('orders.0.id', 1), ('orders.1.id', 2), ('orders.2.id', 3)])
+            self.assertEqual(list(obj.query('orders.1.items.0.extra.sku')),
+                             [('orders.1.items.0.extra.sku', 'd')])
+            self.assertEqual(sorted(obj.query(r'x\.y.*')),
+                             [(r'x\.y.*', 1), (r'x\.y.z', 2)])
+            self.assertEqual(list(obj.query(r'x\.y.\*')), [(r'x\.y.*', 1)])
+            self.assertEqual(list(obj.query('orders.5.id')), [])
+            self.assertEqual(list(obj.query('orders.*.id.*')), [])
+
+            # every match is found once
+            paths = [path for path, _ in obj.query('**.**.*.**')]
+            self.assertEqual(len(paths), len(set(paths)))
+            self.assertEqual(sorted(paths), sorted(
+                path for path, _ in obj.query('**.*')))
+
+            matches = obj.query('orders.*')
+            self.assertEqual(next(matches)[1]['id'], 1)
+            self.assertIsInstance(next(matches)[1], DottedDict)
+
+        query = compile_query('a.*')
+        self.assertIs(compile_query('a.*'), query)
+        self.assertEqual(query.parts, ('a', '*'))
+        self.assertEqual(compile_query('a.**.**.b').parts, ('a', '**', 'b'))
+        self.assertEqual(list(query.iter(DottedDict({'a': [1, 2]}))),
+                         [('a.0', 1), ('a.1', 2)])
+
+    def test_columns(self):
+        """column and columns Tests"""
+        data = [{'metrics': {'latency': {'p99': 10}}, 'tags': ['a', 'b']},
+                {'metrics': {'latency': {'p99': 20}}, 'tags': ['c']},
+                {'metrics': {'latency': {'p99': 30}}, 'tags': []}]
+
+        for lazy in (False, True):
+            obj = DottedList(data, lazy=lazy)
+            self.assertEqual(obj.column('metrics.latency.p99'), [10, 20, 30])
+            self.assertEqual(obj.column('tags.0', default=None),
+                             ['a', 'c', None])
+            self.assertEqual(
+                obj.columns(['metrics.latency.p99', 'tags.1'], default=''),
+                [[10, 20, 30], ['b', '', '']])
+
+            with self.assertRaisesRegexp(KeyError, 'tags.0.*item 2'):
+                obj.column('tags.0')
+            with self.assertRaises(KeyError):
+                obj.column('metrics.latency.p99.x')
+
+        column = obj.column('metrics.latency.p99', format='array')
+        self.assertIsInstance(column, array.array)
+        self.assertIn(column.typecode, ('q', 'l'))
+        self.assertEqual(list(column), [10, 20, 30])
+
+        column = obj.column('missing', default=0.5, format='array')
+        self.assertEqual(column.typecode, 'd')
+        self.assertEqual(list(column), [0.5, 0.5, 0.5])
+
+        with self.assertRaises(TypeError):
+            obj.column('tags.0', default=0, format='array')
+        with self.assertRaises(ValueError):
+            obj.column('tags.0', default=0, format='set')
+
+        try:
+            import numpy
+        except ImportError:
+            self.assertIsInstance(obj.column('metrics.latency.p99',
+                                             format='auto'), array.array)
+            self.assertEqual(obj.column('tags.0', default=None,
+                                        format='auto'), ['a', 'c', None])
+        else:
+            column = obj.column('metrics.latency.p99', format='auto')
+            self.assertIsInstance(column, numpy.ndarray)
+            self.assertEqual(column.tolist(), [10, 20, 30])
+        # mixed values are not coerced
+        self.assertEqual(obj.column('tags.0', default=0, format='auto'),
+                         ['a', 'c', 0])
+
+    def test_frozen(self):
+        """FrozenDottedDict and FrozenDottedList Tests"""
+        data = {'a': {'b': [1, {'c': 2}]}, r'd\.e': {'f': [3]}}
+        obj = freeze(data)
+
+        self.assertIsInstance(obj, FrozenDottedDict)
+        self.assertIsInstance(obj, DottedCollection)
+        self.assertIsInstance(obj['a.b'], FrozenDottedList)
+        self.assertIsInstance(obj['a.b.1'], FrozenDottedDict)
+        self.assertEqual(obj['a.b.1.c'], 2)
+        self.assertEqual(obj.a.b[1].c, 2)
+        self.assertEqual(obj[r'd\.e.f.0'], 3)
+        self.assertIn('a.b.1.c', obj)
+        self.assertEqual(json.loads(obj.to_json()), data)
+        self.assertEqual(obj.to_python(), data)
+        self.assertIs(freeze(obj), obj)
+        self.assertEqual(freeze(DottedCollection.factory(data)), obj)
+        self.assertEqual(freeze(1), 1)
+        # plain mappings compare like they do with a DottedDict
+        self.assertEqual(obj['a.b.1'], {'c': 2})
+        self.assertEqual(freeze({'a': {'b': 1}}), {'a': {'b': 1}})
+        self.assertNotEqual(obj['a.b.1'], {'c': 3})
+
+        # nested collections are frozen too
+        for nested in (FrozenDottedDict({'a': DottedDict({'b': [1]})}),
+                       freeze({'a': DottedDict({'b': [1]})})):
+            self.assertIsInstance(nested['a'], FrozenDottedDict)
+            self.assertIsInstance(nested['a.b'], FrozenDottedList)
+            self.assertEqual(hash(nested), hash(freeze({'a': {'b': [1]}})))
+            with self.assertRaises(TypeError):
+                nested['a']['b'] = 2
+
+        with self.assertRaises(ValueError):
+            freeze({'not.valid': 1})
+
+        for change in (lambda: obj.__setitem__('a.b.0', 2),
+                       lambda: obj.__delitem__('a'),
+                       lambda: setattr(obj, 'x', 1),
+                       lambda: delattr(obj, 'a'),
+                       lambda: obj.a.b.append(1),
+                       lambda: obj.a.b.insert(0, 1),
+                       lambda: obj.update({'x': 1}),
+                       lambda: obj.set_many([('a.x', 1)]),
+                       lambda: obj.set_many([('x.y', 1)]),
+                       lambda: compile_setter('z.y')(obj, 1),
+                       lambda: obj.apply_patch([('add', 'q.r', 1)]),
+                       lambda: obj.deep_merge({'m.n': 1}),
+                       lambda: obj.deep_merge({'a': {'b': [2]}}),
+                       lambda: obj.enable_index()):
+            with self.assertRaises(TypeError):
+                change()
+        self.assertEqual(obj.to_python(), data)
+        self.assertEqual(hash(obj), hash(FrozenDottedDict(data)))
+
+        new = FrozenDottedDict.from_flat([('a.b.0', 1), ('a.b.1.c', 2)])
+        self.assertIsInstance(new['a.b'], FrozenDottedList)
+        self.assertEqual(new, freeze({'a': {'b': [1, {'c': 2}]}}))
+        self.assertEqual(FrozenDottedList.from_flat({'0.a': 1}),
+                         freeze([{'a': 1}]))
+
+        # hashable by value
+        same = FrozenDottedDict(data)
+        self.assertEqual(obj, same)
+        self.assertEqual(hash(obj), hash(same))
+        self.assertEqual(len(set([obj, same, obj.set('a.b.0', 0)])), 2)
+        self.assertEqual({obj: 'cached'}[same], 'cached')
+        self.assertEqual(hash(FrozenDottedList([1, 2])),
+                         hash(FrozenDottedList([1, 2])))
+        self.assertNotEqual(FrozenDottedList([1, 2]), FrozenDottedList([2]))
+        self.assertEqual(obj, DottedCollection.factory(data))
+
+        with self.assertRaises(TypeError):
+            hash(FrozenDottedList([{'x': set()}]))
+
+        # structural sharing
+        new = obj.set('a.b.1.c', 4)
+        self.assertEqual(new['a.b.1.c'], 4)
+        self.assertEqual(obj['a.b.1.c'], 2)
+        self.assertIs(new[r'd\.e'], obj[r'd\.e'])
+        self.assertIsNot(new['a.b'], obj['a.b'])
+        self.assertNotEqual(new, obj)
+        self.assertEqual(new.set('a.b.1.c', 2), obj)
+
+        new = obj.set('x.0.y', {'z': [1]})
+        self.assertIsInstance(new['x'], FrozenDottedList)
+        self.assertIsInstance(new['x.0.y'], FrozenDottedDict)
+        self.assertEqual(new['x.0.y.z.0'], 1)
+        self.assertEqual(obj.set('a.b.2', 5)['a.b'].to_python(),
+                         [1, {'c': 2}, 5])
+
+        new = obj.delete('a.b.0')
+        self.assertEqual(new['a.b'].to_python(), [{'c': 2}])
+        self.assertEqual(len(obj['a.b']), 2)
+        self.assertEqual(obj.delete(r'd\.e').to_python(),
+                         {'a': {'b': [1, {'c': 2}]}})
+
+        with self.assertRaises(KeyError):
+            obj.set('a.b.0.x', 1)
+        with self.assertRaises(KeyError):
+            obj.delete('x.y')
+        with self.assertRaises(IndexError):
+            obj.set('a.b.x', 1)
+
+    def test_deep_merge(self):
+        """deep_merge Tests"""
+        base = {'db': {'host': 'localhost', 'port': 5432, 'opts': [1, 2]},
+                'flags': {'a': True}, 'items': [{'x': 1}, {'y': 2}]}
+
+        for lazy in (False, True):
+            obj = DottedCollection.factory(base, lazy=lazy)
+            flags = obj.flags
+
+            obj.deep_merge({'db': {'host': 'remote', 'opts': [3]},
+                            'db.user': 'me', 'new': {'a.b': 1}})
+            self.assertEqual(obj.to_python(), {
+                'db': {'host': 'remote', 'port': 5432, 'opts': [3],
+                       'user': 'me'},
+                'flags': {'a': True}, 'items': [{'x': 1}, {'y': 2}],
+                'new': {'a': {'b': 1}}})
+            # untouched nodes are kept
+            self.assertIs(obj.flags, flags)
+
+            obj.deep_merge(DottedCollection.factory(
+                {'items': [{'z': 3}], 'flags': {'b': False}}),
+                list_strategy='merge')
+            self.assertEqual(obj['items'].to_python(),
+                             [{'x': 1, 'z': 3}, {'y': 2}])
+            self.assertEqual(obj.flags.to_python(), {'a': True, 'b': False})
+
+            obj.deep_merge({'items': [{'w': 4}]}, list_strategy='append')
+            self.assertEqual(obj['items'].to_python(),
+                             [{'x': 1, 'z': 3}, {'y': 2}, {'w': 4}])
+
+            obj.deep_merge({'items': [{'v': 5}]})
+            self.assertEqual(obj['items'].to_python(), [{'v': 5}])
+
+            # types that can't be merged are replaced
+            obj.deep_merge({'flags': [1], 'db.port': {'a': 1}})
+            self.assertEqual(obj['flags'].to_python(), [1])
+            self.assertEqual(obj['db.port'].to_python(), {'a': 1})
+
+        # merged collections are copied
+        other = DottedCollection.factory({'a': {'b': [1]}})
+        obj = DottedDict()
+        obj.deep_merge(other)
+        obj['a.b.0'] = 2
+        self.assertEqual(other['a.b.0'], 1)
+
+        obj = DottedList([1, {'a': 1}])
+        obj.deep_merge([2, {'b': 2}], list_strategy='merge')
+        self.assertEqual(obj.to_python(), [2, {'a': 1, 'b': 2}])
+
+        plain = obj.to_python(copy=False)
+        obj.deep_merge([2, {'b': 2}], list_strategy='merge')
+        self.assertIs(obj.to_python(copy=False), plain)  # nothing changed
+
+        with self.assertRaises(ValueError):
+            obj.deep_merge({'a': 1})
+        with self.assertRaises(ValueError):
+            obj.deep_merge([1], list_strategy='zip')
+
+    def test_diff(self):
+        """diff and apply_patch Tests"""
+        old = {'a': {'b': [1, 2, 3], 'c': 'x'}, r'd\.e': {'f': 1},
+               'g': [{'h': 1}], 'i': 1}
+        new = {'a': {'b': [1, 5], 'c': 'x', 'n': {'m': [1]}},
+               r'd\.e': {'f': 1.0}, 'g': [{'h': 2}, {'k': 3}], 'i': {'j': 1}}
+
+        for lazy in (False, True):
+            obj = DottedCollection.factory(old, lazy=lazy)
+            ops = obj.diff(new)
+            self.assertEqual(sorted(ops), sorted([
+                ('replace', 'a.b.1', 5), ('remove', 'a.b.2'),
+                ('add', 'a.n', {'m': [1]}), ('replace', r'd\.e.f', 1.0),
+                ('replace', 'g.0.h', 2), ('add', 'g.1', {'k': 3}),
+                ('replace', 'i', {'j': 1})]))
+
+            obj.apply_patch(ops)
+            self.assertEqual(obj.to_python(), new)
+            self.assertEqual(obj.diff(new), [])
+            self.assertEqual(obj.diff(DottedCollection.factory(new)), [])
+
+            # the operations survive a JSON round trip
+            obj = DottedCollection.factory(new, lazy=lazy)
+            obj.apply_patch(json.loads(json.dumps(obj.diff(old))))
+            self.assertEqual(obj.to_python(), old)
+
+        # text and integers compare by value, bools and floats do not
+        obj = DottedDict({'a': 'x', 'b': 1, 'c': 1, 'd': 1})
+        self.assertEqual(
+            sorted(obj.diff({'a': u'x', 'b': 1, 'c': True, 'd': 1.0})),
+            [('replace', 'c', True), ('replace', 'd', 1.0)])
+
+        # shared subtrees are not compared
+        frozen = freeze(old)
+        changed = frozen.set('g.0.h', 5)
+        self.assertEqual(frozen.diff(changed), [('replace', 'g.0.h', 5)])
+
+        obj = DottedList([1, 2, 3, 4])
+        obj.apply_patch([('remove', '0'), ('add', '0', 'x'), ('add', '4', 6),
+                         ('add', '5.0.a', 1), ('remove', '2')])
+        self.assertEqual(obj.to_python(), ['x', 2, 4, 6, [{'a': 1}]])
+
+        obj = DottedDict({'a': [{'b': 1}, {'b': 2}]})
+        obj.apply_patch([('replace', 'a.0.b', 3), ('remove', 'a.0'),
+                         ('replace', 'a.0.b', 4)])
+        self.assertEqual(obj.to_python(), {'a': [{'b': 4}]})
+
+        with self.assertRaises(KeyError):
+            obj.apply_patch([('replace', 'x', 1)])
+        with self.assertRaises(IndexError):
+            obj.apply_patch([('replace', 'a.1', 1)])
+        with self.assertRaises(ValueError):
+            obj.apply_patch([('move', 'a', 1)])
+        with self.assertRaises(ValueError):
+            obj.diff([1])
+
+    def test_tracking(self):
+        """enable_tracking and collect_changes Tests"""
+        data = {'a': {'b': [{'c': 1}, {'c': 2}]}, r'd\.e': {'f': 3}, 'g': 4}
+
+        for lazy in (False, True):
+            obj = DottedCollection.factory(data, lazy=lazy)
+            self.assertEqual(obj.collect_changes(), [])
+            obj.enable_tracking()
+            self.assertEqual(obj.collect_changes(), [])
+
+            self.assertEqual(obj['a.b.1.c'], 2)  # reads are not changes
+            self.assertEqual(obj.collect_changes(), [])
+
+            obj['a.b.1.c'] = 5
+            obj[r'd\.e'].f = 6
+            obj.g = 7
+            self.assertEqual(obj.collect_changes(),
+                             ['a.b.1.c', r'd\.e.f', 'g'])
+
+            obj.clear_changes()
+            obj['a.b'][-2]['c'] = 1  # negative indexes are normalized
+            self.assertEqual(obj.collect_changes(), ['a.b.0.c'])
+
+            obj.clear_changes()
+            obj['x.y.0.z'] = 1  # new nodes are changes
+            obj['a.b'].append({'c': 8})
+            self.assertEqual(obj.collect_changes(), ['a.b.2', 'x'])
+
+            obj.clear_changes()
+            obj['a.b'].insert(0, 0)  # moves the following items
+            del obj['g']
+            self.assertEqual(obj.collect_changes(),
+                             ['a.b.0', 'a.b.1', 'a.b.2', 'a.b.3', 'g'])
+
+            obj.clear_changes()
+            del obj['a.b.3']
+            obj.deep_merge({'a': {'b': [0, {'c': 9}]}},
+                           list_strategy='merge')
+            obj.apply_patch([('add', 'h', 1)])
+            self.assertEqual(obj.collect_changes(),
+                             ['a.b.1.c', 'a.b.3', 'h'])
+
+            # replaced nodes are no longer tracked
+            old = obj['a.b.1']
+            obj['a.b.1'] = {'c': 10}
+            obj.clear_changes()
+            old['c'] = 11
+            self.assertEqual(obj.collect_changes(), [])
+
+            obj.enable_index()
+            obj.disable_tracking()
+            obj['a.b.1.c'] = 12
+            self.assertEqual(obj.collect_changes(), [])
+            self.assertEqual(obj['a.b.1.c'], 12)
+            obj.disable_index()
+            self.assertIsNone(obj._index)
+            self.assertIsNone(obj['a.b.1']._index)
+
+        with self.assertRaises(TypeError):
+            freeze(data).enable_tracking()
+
+    def test_accessors(self):
+        plain = {'a': {'b': [1, {'c': 2}]}, r'd\.e': {'0': 3}, 'f': 'xyz'}
+        lazy = DottedCollection.factory(copy.deepcopy(plain), lazy=True)
+
+        for obj in (DottedCollection.factory(plain), lazy, plain):
+            getter = compile_getter('a.b.01.c')
+            self.assertEqual(getter(obj), 2)
+            self.assertEqual(compile_getter(r'd\.e.0')(obj), 3)
+            self.assertEqual(compile_getter(parse_key('a.b.0'))(obj), 1)
+
+            for path in ('a.x', 'a.b.5', 'a.b.x', 'a.b.0.c', 'f.0', 'a.b.-1'):
+                with self.assertRaises(KeyError):
+                    compile_getter(path)(obj)
+                self.assertIsNone(compile_getter(path, default=None)(obj))
+
+            self.assertEqual(
+                compile_getters(['a.b.1.c', 'x', 'a.b.0'], default=0)(obj),
+                (2, 0, 1))
+            self.assertEqual(compile_getters(['a.b.0'])(obj), (1, ))
+            with self.assertRaises(KeyError):
+                compile_getters(['a.b.0', 'x'])(obj)
+
+        # generated once per path
+        self.assertIs(compile_getter('a.b.01.c').__code__,
+                      compile_getter('a.b.01.c').__code__)
+
+        obj = DottedCollection.factory(plain)
+        obj.enable_index()
+        for target in (obj, lazy, plain):
+            compile_setter('a.b.1.c')(target, 4)
+            compile_setter('a.b.2.g')(target, [{'h': 5}])
+            compile_setter('new.0.path')(target, 6)
+            compile_setter(r'd\.e.0')(target, 7)
+            self.assertEqual(target['a.b.2.g.0.h'] if target is not plain
+                             else target['a']['b'][2]['g'][0]['h'], 5)
+            with self.assertRaises(IndexError):
+                compile_setter('a.b.5.c')(target, 1)
+            with self.assertRaises(IndexError):
+                compile_setter('a.b.5')(target, 1)
+
+        self.assertEqual(obj.to_python(), plain)
+        self.assertEqual(lazy.to_python(), plain)
+        self.assertEqual(plain['new'], [{'path': 6}])
+        self.assertEqual(obj['a.b.1.c'], 4)
+        self.assertIsInstance(obj['a.b.2.g'], DottedList)
+        with self.assertRaises(ValueError):
+            compile_setter('a.x')(obj, {'bad.key': 1})
+        with self.assertRaises(TypeError):
+            compile_setter('a')(freeze(plain), 1)
+
+    def test_copy(self):
+        """copy, deepcopy and pickle Tests"""
+        data = {'a': {'b': [1, {'c': 2}]}, r'd\.e': {'f': 3}}
+        leaf = set([1])
+
+        for lazy in (False, True):
+            obj = DottedCollection.factory(data, lazy=lazy)
+            obj['g'] = leaf
+
+            for func in (copy.copy, copy.deepcopy,
+                         lambda obj: pickle.loads(pickle.dumps(obj))):
+                new = func(obj)
+                self.assertIsInstance(new, DottedDict)
+                self.assertEqual(new._lazy, lazy)
+                self.assertEqual(new.to_python(), obj.to_python())
+                self.assertIs(new['a']._parent, new)
+
+                new['a.b.1.c'] = 4
+                new[r'd\.e'].f = 5
+                self.assertEqual(obj['a.b.1.c'], 2)
+                self.assertEqual(obj[r'd\.e.f'], 3)
+
+            self.assertIs(copy.copy(obj)['g'], leaf)
+            self.assertIsNot(copy.deepcopy(obj)['g'], leaf)
+
+        # the copies see changes made through an aliased node
+        inner = DottedDict({'y': 3})
+        obj = DottedList([inner])
+        obj.to_json()
+        inner['y'] = 4
+        for func in (copy.copy, copy.deepcopy,
+                     lambda obj: pickle.loads(pickle.dumps(obj))):
+            self.assertEqual(func(obj).to_python(), [{'y': 4}])
+
+        # lazy copies validate nested values like the original
+        for validate in (True, False):
+            obj = DottedDict({'a': {'b.c': 1}}, lazy=True, validate=validate)
+            for func in (copy.copy, copy.deepcopy,
+                         lambda obj: pickle.loads(pickle.dumps(obj))):
+                if validate:
+                    with self.assertRaises(ValueError):
+                        func(obj)['a']
+                else:
+                    self.assertEqual(func(obj)['a'].to_python(),
+                                     {'b.c': 1})
+
+        obj = DottedList([{'a': [1]}])
+        self.assertEqual(copy.deepcopy(obj).to_python(), [{'a': [1]}])
+        self.assertIsInstance(copy.copy(obj)[0], DottedDict)
+
+        obj = freeze(data)
+        self.assertEqual(pickle.loads(pickle.dumps(obj)), obj)
+        self.assertIsInstance(copy.deepcopy(obj), FrozenDottedDict)
+
+        # missing attributes are AttributeErrors too
+        obj = DottedDict(data)
+        self.assertFalse(hasattr(obj, 'missing'))
+        self.assertEqual(getattr(obj, 'missing', None), None)
+        with self.assertRaises(KeyError):
+            obj.missing
+        with self.assertRaises(DottedKeyError):
+            obj.a.missing
+
+    def test_path_cache(self):
+        """parse_key() LRU cache Tests"""
+        try:
+            set_path_cache_size(2)
+
+            path = parse_key("a.b")
+            self.assertIs(parse_key("a.b"), path)
+            self.assertIs(parse_key(path), path)
+
+            other_path = parse_key("c.d")
+            parse_key("a.b")  # a.b is now the most recently used key
+            parse_key("e.f")  # discards c.d
+
+            self.assertIs(parse_key("a.b"), path)
+            self.assertIsNot(parse_key("c.d"), other_path)
+
+            set_path_cache_size(0)
+            self.assertIsNot(parse_key("a.b"), parse_key("a.b"))
+            self.assertEqual(parse_key("a.b"), path)
+        finally:
+            set_path_cache_size(PATH_CACHE_SIZE)
 
 
 if __name__ == '__main__':
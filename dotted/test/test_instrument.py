@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+import unittest2 as unittest
+
+from dotted import collection, instrument
+from dotted.collection import DottedCollection, DottedDict
+
+
+class InstrumentTests(unittest.TestCase):
+
+    def setUp(self):
+        instrument.reset()
+
+    def tearDown(self):
+        instrument.disable()
+        instrument.reset()
+
+    def test_collect(self):
+        original = vars(DottedDict)['__getitem__']
+        parse_key = collection.parse_key
+        obj = DottedCollection.factory({'a': {'b': [1, {'c': 2}]}})
+        obj['a.b.1.c']
+
+        with instrument.collect() as stats:
+            self.assertTrue(instrument.is_enabled())
+            self.assertIsNot(vars(DottedDict)['__getitem__'], original)
+
+            DottedCollection.factory({'x': [{'y': 1}]})
+            obj['a.b.1.c']
+            obj['a.b.1.c']
+            obj.to_json()
+            self.assertFalse(hasattr(obj, 'missing'))
+            with self.assertRaises(IndexError):
+                obj['a.b.5']
+
+        self.assertFalse(instrument.is_enabled())
+        self.assertIs(vars(DottedDict)['__getitem__'], original)
+        self.assertIs(collection.parse_key, parse_key)
+
+        self.assertEqual(stats['nodes_wrapped'], 3)
+        self.assertEqual(stats['keys_parsed'], 4)
+        self.assertEqual(stats['parse_cache_hits'], 2)
+        self.assertEqual(stats['depth'], {4: 2, 1: 1, 3: 1})
+        self.assertEqual(stats['misses'], 2)
+        self.assertEqual(stats['calls']['factory'], 3)
+        self.assertEqual(stats['calls']['to_json'], 1)
+        self.assertEqual(stats['calls']['split_key'], 2)
+        self.assertGreater(stats['time']['factory'], 0)
+        self.assertEqual(stats['time']['to_python'], 0)
+
+        # nothing is counted when it's disabled
+        obj['a.b.0']
+        self.assertEqual(instrument.snapshot()['keys_parsed'], 4)
+
+    def test_enable(self):
+        instrument.enable()
+        instrument.enable()
+        DottedDict({'a': {'b': 1}}).to_python()
+
+        with instrument.collect() as stats:
+            DottedDict()
+
+        # the outer measure goes on
+        self.assertTrue(instrument.is_enabled())
+        self.assertEqual(stats['nodes_wrapped'], 1)
+        self.assertEqual(stats['calls']['to_python'], 0)
+
+        snapshot = instrument.snapshot()
+        self.assertEqual(snapshot['nodes_wrapped'], 3)
+        self.assertEqual(snapshot['calls']['to_python'], 2)
+        self.assertEqual(snapshot['calls']['_validate_initial'], 3)
+        self.assertGreater(snapshot['time']['to_python'], 0)
+
+        instrument.disable()
+        instrument.reset()
+        self.assertEqual(instrument.snapshot()['nodes_wrapped'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+import json
+
+import unittest2 as unittest
+
+from dotted import backends
+from dotted.collection import DottedDict, DottedList
+from dotted.parallel import dump_many, load_many
+
+
+def name(obj):
+    return obj['user.name']
+
+
+class ParallelTests(unittest.TestCase):
+
+    def setUp(self):
+        backends.set_backend('json')
+
+    def tearDown(self):
+        backends.set_backend()
+
+    def test_load_many(self):
+        records = [{'user': {'name': 'u%d' % i, 'tags': [i]}}
+                   for i in range(25)] + [[1, {'a': 2}]]
+        texts = [json.dumps(record) for record in records]
+
+        result = list(load_many(texts, workers=2, chunk_size=4))
+        self.assertEqual([obj.to_python() for obj in result], records)
+        self.assertIsInstance(result[0]['user'], DottedDict)
+        self.assertIsInstance(result[-1], DottedList)
+
+        result = list(load_many(texts, lazy=True, workers=2, chunk_size=30))
+        self.assertEqual(result[3].store['user'], records[3]['user'])
+
+        self.assertEqual(list(load_many(texts[:-1], func=name, workers=2,
+                                        chunk_size=3)),
+                         ['u%d' % i for i in range(25)])
+
+        with self.assertRaises(ValueError):
+            list(load_many(['{"a": {"bad.key": 1}}'], workers=1))
+        with self.assertRaises(ValueError):
+            list(load_many(['{"a": '], workers=1))
+        self.assertEqual(list(load_many(['{"a.b": 1}'], validate=False,
+                                        workers=1))[0].store, {'a.b': 1})
+        self.assertEqual(list(load_many([], workers=1)), [])
+
+    def test_dump_many(self):
+        records = [DottedDict({'a': {'b': [i]}}) for i in range(10)] + [[1]]
+
+        self.assertEqual(list(dump_many(records, workers=2, chunk_size=3)),
+                         [record.to_json() for record in records[:-1]] +
+                         ['[1]'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import tempfile
+
+import unittest2 as unittest
+
+from dotted import backends
+from dotted.collection import DottedDict
+from dotted.sqlite import SQLiteDottedDict, SQLiteDottedList
+
+
+class SQLiteDottedDictTests(unittest.TestCase):
+
+    def setUp(self):
+        backends.set_backend('json')
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, 'test.db')
+
+    def tearDown(self):
+        backends.set_backend()
+        shutil.rmtree(self.directory)
+
+    def test_sqlite_dotted_dict(self):
+        obj = SQLiteDottedDict(initial={
+            'a': {'b': [1, {'c': 2}]}, r'd\.e': {'f': 3}})
+
+        self.assertEqual(obj['a.b.0'], 1)
+        self.assertEqual(obj['a.b.01'], {'c': 2})
+        self.assertEqual(obj.a.b[1].c, 2)
+        self.assertEqual(obj[r'd\.e.f'], 3)
+        self.assertEqual(obj['a.b'][-1].c, 2)
+        self.assertIsInstance(obj['a'], SQLiteDottedDict)
+        self.assertIsInstance(obj['a.b'], SQLiteDottedList)
+        self.assertEqual(sorted(obj), ['a', r'd\.e'])
+        self.assertEqual(len(obj['a.b']), 2)
+        self.assertIn('a.b.1.c', obj)
+        self.assertNotIn('a.b.2', obj)
+        self.assertNotIn('a.b.0.x', obj)
+
+        with self.assertRaises(KeyError):
+            obj['a.x']
+        with self.assertRaises(IndexError):
+            obj['a.b.x']
+        with self.assertRaises(IndexError):
+            obj['a.b.0.x']
+        self.assertFalse(hasattr(obj, 'x'))
+        with self.assertRaises(ValueError):
+            obj['x'] = {'not.valid': 1}
+        with self.assertRaises(KeyError):
+            obj['x'] = {'\x1f': 1}
+
+        # nested views write to the same file
+        view = obj['a']
+        view['b.1.c'] = 3
+        view.g = {'h': 4}
+        obj['new.0.path'] = 5
+        self.assertEqual(obj['a.b.1.c'], 3)
+        self.assertEqual(obj['a.g.h'], 4)
+        self.assertEqual(obj.to_python()['new'], [{'path': 5}])
+        self.assertEqual(view.to_python(),
+                         {'b': [1, {'c': 3}], 'g': {'h': 4}})
+        self.assertEqual(obj.a.to_json(), '{"b": [1, {"c": 3}], "g": {"h": 4}}')
+
+        # replacing a node removes its descendants
+        obj['a.b.1'] = DottedDict({'x': 1})
+        self.assertEqual(obj['a.b'].to_python(), [1, {'x': 1}])
+        del obj['a.g']
+        self.assertNotIn('a.g', obj)
+        with self.assertRaises(KeyError):
+            del obj['a.g']
+
+        items = obj['a.b']
+        items.append([2])
+        items.insert(0, 0)
+        items.insert(-1, 'x')
+        self.assertEqual(items.to_python(), [0, 1, {'x': 1}, 'x', [2]])
+        del items[1]
+        self.assertEqual(items.to_python(), [0, {'x': 1}, 'x', [2]])
+        self.assertEqual(items[1:3], [{'x': 1}, 'x'])
+        self.assertEqual(items['3.0'], 2)
+        with self.assertRaises(IndexError):
+            items[5] = 1
+        with self.assertRaises(IndexError):
+            del items[4]
+        items[-1] = 'y'
+        self.assertEqual(list(items), [0, {'x': 1}, 'x', 'y'])
+
+        # nested nodes keep their parent when list items are moved
+        items.insert(0, {'m': [1, 2]})
+        self.assertEqual(len(items[2]), 1)
+        self.assertEqual(sorted(items[0]), ['m'])
+        del items[0]
+        self.assertEqual(len(items), 4)
+        self.assertEqual(sorted(items[1]), ['x'])
+        self.assertEqual(len(obj), 3)
+
+        obj.delete_many(['a.b.0', 'a.b.2', 'new.0.path'])
+        self.assertEqual(obj['a.b'].to_python(), [{'x': 1}, 'y'])
+        self.assertEqual(obj.new.to_python(), [{}])
+        self.assertEqual(obj['a'].diff({'b': [{'x': 2}, 'y']}),
+                         [('replace', 'b.0.x', 2)])
+        self.assertEqual(obj.flatten()['a.b.1'], 'y')
+
+        # methods that would read plain copies of the store
+        for change in (lambda: obj.deep_merge({'a': {'c': 1}}),
+                       lambda: list(obj.query('a.*')),
+                       lambda: obj.apply_patch([('add', 'a.c', 1)]),
+                       lambda: SQLiteDottedDict.from_flat({'a.b': 1})):
+            with self.assertRaises(TypeError):
+                change()
+        self.assertEqual(obj['a.b.0.x'], 1)
+
+    def test_cache(self):
+        obj = SQLiteDottedDict(cache_size=3, initial={
+            'a': {'b': {'c': 1, 'd': 2}}, 'e': [{'f': 3}, 4]})
+        db = obj._db
+
+        for key in ('a.b.c', 'a.b.d', 'e.0.f', 'e.1', 'a.b'):
+            obj[key]
+        self.assertEqual(len(db.cache.rows), 3)
+
+        obj['a.b.c']
+        obj['a'] = {'x': 1}
+        self.assertFalse(any(path.startswith('\x1fa') for path in
+                             db.cache.rows))
+        self.assertEqual(obj.to_python(),
+                         {'a': {'x': 1}, 'e': [{'f': 3}, 4]})
+
+        obj['e.0.f']
+        obj['e'].insert(0, 0)
+        self.assertEqual(obj['e.1.f'], 3)
+        self.assertEqual(sum(len(paths) for paths in
+                             db.cache.children.values()),
+                         len(db.cache.rows))
+
+    def test_persistence(self):
+        with SQLiteDottedDict(self.filename, batch_size=2) as obj:
+            obj['a.b'] = [1, 2]
+            obj['c'] = {'d': None, 'e': u'ñ'}
+
+        obj = SQLiteDottedDict(self.filename, cache_size=1, batch_size=2)
+        self.assertEqual(obj.to_python(),
+                         {'a': {'b': [1, 2]}, 'c': {'d': None, 'e': u'ñ'}})
+
+        # writes are committed in batches
+        obj['f'] = 1
+        obj['g'] = 2
+        obj['h'] = 3
+        reader = SQLiteDottedDict(self.filename)
+        self.assertIn('g', reader)
+        self.assertNotIn('h', reader)
+        reader.close()
+        obj.close()
+
+        obj = SQLiteDottedDict(self.filename)
+        self.assertEqual(sorted(obj), ['a', 'c', 'f', 'g', 'h'])
+        obj.close()
+
+
+    def test_failed_writes(self):
+        obj = SQLiteDottedDict(self.filename)
+        obj['a'] = {'keep': 1}
+        obj['b'] = [2]
+
+        with self.assertRaises(TypeError):
+            obj['a'] = {'bad': set([1, 2])}
+        with self.assertRaises(KeyError):
+            obj['b'] = {'x\x1fy': 1}
+        with self.assertRaises(TypeError):
+            obj.update({'a': 3, 'b': {'bad': object()}})
+
+        self.assertEqual(obj.to_python(), {'a': 3, 'b': [2]})
+        obj.close()
+
+        obj = SQLiteDottedDict(self.filename)
+        self.assertEqual(obj.to_python(), {'a': 3, 'b': [2]})
+        obj.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
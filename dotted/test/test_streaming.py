@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+import io
+import json
+
+import unittest2 as unittest
+from six import text_type
+
+from dotted.collection import DottedCollection, DottedDict, DottedList
+from dotted.streaming import _iter_chunks, _Reader, dump_lines, iter_lines, \
+    load, load_projected, projection
+from dotted.utils import dot_json_stream, iter_dot_jsonl, write_dot_jsonl
+
+
+DOCUMENT = {
+    "meta": {"count": 3, "name": u"x\"y\\z é"},
+    "items": [
+        {"name": "a", "values": list(range(20))},
+        {"name": "b", "n": -1.5e3},
+        {"name": "c", "t": True, "f": False, "z": None},
+    ],
+    "d\\.o": {"origen": "rioja"},
+}
+
+
+def chunked(text, size):
+    data = text.encode('utf-8')
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+class StreamingTests(unittest.TestCase):
+
+    def test_load(self):
+        text = json.dumps(DOCUMENT)
+
+        for size in (1, 3, 7, 1024):
+            self.assertEqual(load_projected(chunked(text, size)), DOCUMENT)
+
+        obj = load(io.BytesIO(text.encode('utf-8')), chunk_size=5)
+        self.assertIsInstance(obj, DottedDict)
+        self.assertIsInstance(obj['items'], DottedList)
+        self.assertEqual(obj.to_python(), DOCUMENT)
+
+        obj = dot_json_stream(io.StringIO(text_type(text)))
+        self.assertEqual(obj['items.1.n'], -1500.0)
+
+        self.assertEqual(load_projected('[]'), [])
+        self.assertEqual(load_projected(' {} '), {})
+
+    def test_projection(self):
+        text = json.dumps(DOCUMENT)
+        paths = ['meta.name', 'items.2', 'items.0.name', 'missing.path',
+                 'd\\.o']
+        expected = {
+            "meta": {"name": u"x\"y\\z é"},
+            "items": [{"name": "a"}, None,
+                      {"name": "c", "t": True, "f": False, "z": None}],
+            "d\\.o": {"origen": "rioja"},
+        }
+
+        for size in (1, 3, 7, 1024):
+            self.assertEqual(load_projected(chunked(text, size), paths),
+                             expected)
+
+        obj = load(chunked(text, 10), paths=['items.1.n', 'meta'])
+        self.assertEqual(obj.to_python(), {
+            "meta": {"count": 3, "name": u"x\"y\\z é"},
+            "items": [None, {"n": -1500.0}],
+        })
+        self.assertFalse('d\\.o' in obj)
+
+        # a shorter path keeps the whole subtree
+        self.assertEqual(
+            load_projected(text, ['items.0.name', 'items']),
+            {"items": DOCUMENT["items"]})
+
+        # paths through scalars do not exist
+        self.assertEqual(load_projected(text, ['meta.count.x']),
+                         {"meta": {}})
+
+        # numbers split by a chunk boundary, skipped and kept
+        numbers = {"a": [1.5, -0.25e-3, 2E+10, 3e5, 10, 0], "b": 1.125e2,
+                   "c": {"d": -7.5E-1, "e": 12.0}}
+        text = json.dumps(numbers)
+        for size in (1, 2, 3, 5):
+            for paths in (['a'], ['b'], ['c.d'], ['a.1', 'c.e']):
+                self.assertEqual(
+                    load_projected(chunked(text, size), paths),
+                    load_projected(text, paths))
+        self.assertEqual(load_projected(chunked(text, 1), ['c']),
+                         {"c": numbers["c"]})
+        self.assertEqual(load_projected(['{"x": 1.', '5, "a": 1}'], ['a']),
+                         {"a": 1})
+        self.assertEqual(load_projected(['{"x": 1e', '-5, "a": 2E', '+1}'],
+                                        ['a', 'x']),
+                         {"a": 20.0, "x": 1e-5})
+
+    def test_long_strings(self):
+        value = u'ab\\"c\\\\"é' * 5000
+        text = json.dumps({"skip": value, "keep": 1, value[:50]: value})
+
+        for size in (1, 7, 4096):
+            self.assertEqual(load_projected(chunked(text, size), ['keep']),
+                             {"keep": 1})
+            self.assertEqual(load_projected(chunked(text, size)),
+                             json.loads(text))
+
+        # skipped strings are not kept in the buffer
+        sizes = []
+
+        def chunks():
+            for chunk in chunked(text, 4096):
+                sizes.append(len(reader.buf))
+                yield chunk
+
+        reader = _Reader(_iter_chunks(chunks(), 4096))
+        self.assertEqual(reader.value(projection(['keep'])), {"keep": 1})
+        self.assertLess(max(sizes), 2 * 4096)
+
+    def test_bad_json(self):
+        for text in ('{"a": 1', '[1, 2', '{"a" 1}', '{"a": 1} x', 'tru', '',
+                     '{"a": "b', '{1: 2}'):
+            with self.assertRaises(ValueError):
+                load_projected(chunked(text, 2))
+            with self.assertRaises(ValueError):
+                load_projected(chunked(text, 2), ['a'])
+
+        with self.assertRaises(ValueError):
+            load('{"a": {"bad.key": 1}}')
+
+    def test_lines(self):
+        records = [DOCUMENT, [1, {"a": 2}], {"b\\.c": u"é"}]
+        text = '\n'.join(json.dumps(record) for record in records)
+
+        for size in (1, 7, 1024):
+            result = list(iter_lines(chunked(text + '\n\n', size)))
+            self.assertEqual([record.to_python() for record in result],
+                             records)
+        self.assertIsInstance(result[0], DottedDict)
+        self.assertIsInstance(result[1], DottedList)
+
+        # lazy records wrap nested values on first access
+        record = next(iter_dot_jsonl(io.BytesIO(text.encode('utf-8')),
+                                     lazy=True))
+        self.assertEqual(record['meta.count'], 3)
+        self.assertEqual(record.store['items'], DOCUMENT['items'])
+
+        with self.assertRaises(ValueError) as context:
+            list(iter_lines('{"a": 1}\n{"a": \n'))
+        self.assertIn('line 2', str(context.exception))
+        with self.assertRaises(ValueError):
+            list(iter_lines('{"bad.key": 1}'))
+
+        for target in (io.StringIO(), io.BytesIO()):
+            dump_lines((DottedCollection.factory(record)
+                        for record in records), target, batch=2)
+            value = target.getvalue()
+            if isinstance(value, bytes):
+                value = value.decode('utf-8')
+            self.assertEqual(value.count('\n'), 3)
+            self.assertEqual(
+                [record.to_python() for record in iter_lines(value)],
+                records)
+
+        target = io.BytesIO()
+        write_dot_jsonl([{"a": 1}, [2]], target)
+        lines = target.getvalue().decode('utf-8').split('\n')
+        self.assertEqual([json.loads(line) for line in lines[:-1]],
+                         [{"a": 1}, [2]])
+        self.assertEqual(lines[-1], '')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+import threading
+
+import unittest2 as unittest
+
+from dotted.collection import DottedDict, DottedList
+from dotted.threadsafe import ConcurrentDottedDict
+
+
+class ConcurrentDottedDictTests(unittest.TestCase):
+
+    def test_concurrent_dotted_dict(self):
+        obj = ConcurrentDottedDict({'a': {'b': [1, {'c': 2}]}, r'd\.e': 3})
+
+        self.assertEqual(obj['a.b.0'], 1)
+        self.assertEqual(obj.a.b[1].c, 2)
+        self.assertEqual(obj[r'd\.e'], 3)
+        self.assertIsInstance(obj['a'], DottedDict)
+        self.assertIsInstance(obj['a.b'], DottedList)
+        self.assertIn('a.b.1.c', obj)
+        self.assertNotIn('a.b.2', obj)
+        self.assertNotIn('a.b.0.x', obj)
+        self.assertEqual(sorted(obj), ['a', r'd\.e'])
+
+        with self.assertRaises(KeyError):
+            obj['a.x']
+        self.assertFalse(hasattr(obj, 'x'))
+        with self.assertRaises(ValueError):
+            obj['x'] = {'not.valid': 1}
+        with self.assertRaises(ValueError):
+            ConcurrentDottedDict({'not.valid': 1})
+
+        before = obj.snapshot()
+        obj['a.b.2'] = {'f': 4}
+        obj['new.0.path'] = 5
+        obj.g = 6
+        self.assertEqual(obj['a.b.2.f'], 4)
+        self.assertEqual(obj.to_python()['new'], [{'path': 5}])
+        self.assertEqual(obj.g, 6)
+        self.assertNotIn('a.b.2', before)
+        self.assertNotIn('new', before)
+
+        # returned collections are read-only
+        view = obj['a']
+        writes = (
+            lambda: setattr(view.b[1], 'c', 7),
+            lambda: view['b'][1].__setitem__('c', 7),
+            lambda: view.__setitem__('b.1.c', 7),
+            lambda: view.__delitem__('b'),
+            lambda: view.b.append(8),
+            lambda: view.b.insert(0, 8),
+            lambda: view.set_many({'x.y': 1}),
+            lambda: view.deep_merge({'b': [3]}),
+            lambda: before.update({'g': 1}),
+        )
+        for write in writes:
+            with self.assertRaises(TypeError):
+                write()
+        self.assertEqual(obj['a.b.1.c'], 2)
+        self.assertEqual(view.to_python(), {'b': [1, {'c': 2}, {'f': 4}]})
+
+        # untouched subtrees are shared
+        self.assertIs(obj.snapshot().to_python(copy=False)[r'd\.e'], 3)
+        root = obj._root
+        obj['a.b.0'] = 0
+        self.assertIsNot(obj._root['a'], root['a'])
+        self.assertIs(obj._root['new'], root['new'])
+
+        obj.update({'x.y': 1}, z=2)
+        obj.delete_many(['new.0.path', 'g'])
+        del obj.z
+        del obj['a.b.2']
+        self.assertEqual(obj.to_python(), {
+            'a': {'b': [0, {'c': 2}]}, r'd\.e': 3, 'new': [{}],
+            'x': {'y': 1}})
+
+    def test_stress(self):
+        obj = ConcurrentDottedDict({'a': {'x': 0, 'y': 0}})
+        writes = 300
+        errors = []
+        done = threading.Event()
+
+        def read():
+            try:
+                while not done.is_set():
+                    snapshot = obj.snapshot()
+                    # both keys are always written together
+                    self.assertEqual(snapshot['a.x'], snapshot['a.y'])
+                    for key in snapshot:
+                        if key.startswith('gen'):
+                            # nodes are never seen half built
+                            self.assertEqual(snapshot[key + '.deep.0.value'],
+                                             int(key[3:]))
+                    self.assertLessEqual(snapshot['a.x'], obj['a.y'])
+            except Exception as error:
+                errors.append(error)
+
+        readers = [threading.Thread(target=read) for _ in range(4)]
+        for reader in readers:
+            reader.start()
+
+        for i in range(1, writes + 1):
+            obj.set_many([('a.x', i), ('gen%d.deep.0.value' % i, i),
+                          ('a.y', i)])
+            if i > 10:
+                del obj['gen%d' % (i - 10)]
+
+        done.set()
+        for reader in readers:
+            reader.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(obj['a.x'], writes)
+        self.assertEqual(len(obj), 11)
+
+
+if __name__ == '__main__':
+    unittest.main()
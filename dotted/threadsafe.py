@@ -0,0 +1,238 @@
+# -*- coding: utf-8 -*-
+"""A DottedDict that can be shared by several threads.
+
+Readers walk an immutable snapshot of plain dicts and lists without taking
+any lock. Writers copy the containers along the modified paths, so every
+untouched subtree is shared, and publish the new root with a single
+attribute assignment:
+
+    config = ConcurrentDottedDict({'db': {'host': 'localhost'}})
+
+    config['db.host']  # lock-free
+    config.set_many({'db.host': 'remote', 'db.port': 5432})  # atomic
+
+Readers that need several consistent values take a snapshot() first.
+Nested dicts and lists are returned as read-only views, so writing to them
+raises TypeError instead of changing a copy that is thrown away.
+"""
+
+import collections
+import threading
+
+from six import iteritems
+
+from dotted import backends
+from dotted.collection import DottedCollection, DottedDict, DottedKeyError, \
+    DottedList, _is_index, _key_parts, _to_python
+
+
+class ConcurrentDottedDict(collections.MutableMapping):
+    """A dict with support for the dotted path syntax, safe to read and
+    write from several threads. Nested dicts and lists are returned as
+    read-only lazy collections over the current snapshot.
+    """
+
+    __slots__ = ('_root', '_lock')
+
+    def __init__(self, initial=None, validate=True):
+        object.__setattr__(self, '_lock', threading.Lock())
+        object.__setattr__(self, '_root', _plain(
+            DottedDict(initial, validate=validate)))
+
+    def snapshot(self):
+        """Returns a read-only lazy DottedDict over the current state. Later
+        writes are not visible in it.
+        """
+        return _view(self._root)
+
+    def __getitem__(self, key):
+        return _view(_lookup(self._root, _key_parts(key)))
+
+    def __contains__(self, key):
+        try:
+            _lookup(self._root, _key_parts(key))
+        except (KeyError, IndexError):
+            return False
+        return True
+
+    def __setitem__(self, key, value):
+        self.set_many([(key, value)])
+
+    def __delitem__(self, key):
+        self.delete_many([key])
+
+    def __iter__(self):
+        return iter(self._root)
+
+    def __len__(self):
+        return len(self._root)
+
+    def __repr__(self):
+        return repr(self._root)
+
+    def __getattr__(self, key):
+        try:
+            return self.__getitem__(key)
+        except KeyError as error:
+            raise DottedKeyError(*error.args)
+
+    def __setattr__(self, key, value):
+        self.__setitem__(key, value)
+
+    def __delattr__(self, key):
+        self.__delitem__(key)
+
+    def set_many(self, items):
+        """Sets several dotted keys and publishes all the changes at once.
+        items can be a mapping or an iterable of (key, value) pairs. Missing
+        nodes are created like DottedDict does.
+        """
+        if hasattr(items, 'keys'):
+            items = iteritems(items)
+        # validated and converted before taking the lock
+        items = [(_key_parts(key), _plain(DottedCollection.factory(value)))
+                 for key, value in items]
+
+        with self._lock:
+            copies = set()
+            root = _copy(self._root, copies)
+            for parts, value in items:
+                _assign(root, parts, value, copies)
+            object.__setattr__(self, '_root', root)
+
+    def delete_many(self, keys):
+        """Deletes several dotted keys and publishes all the changes at once.
+        Keys are deleted in order.
+        """
+        keys = [_key_parts(key) for key in keys]
+
+        with self._lock:
+            copies = set()
+            root = _copy(self._root, copies)
+            for parts in keys:
+                node = _descend(root, parts, copies, create=False)
+                del node[_step(node, parts[-1])]
+            object.__setattr__(self, '_root', root)
+
+    def update(self, *args, **kwargs):
+        """Like dict.update, but all the changes are published at once"""
+        items = []
+        for other in args + (kwargs, ):
+            items.extend(iteritems(other) if hasattr(other, 'keys')
+                         else other)
+        self.set_many(items)
+
+    def to_python(self):
+        """Returns a plain python copy of the current state"""
+        return _to_python(self._root)
+
+    def to_json(self):
+        return backends.dumps(self._root)
+
+
+class _View(object):
+    """Read-only lazy collection over a snapshot of a ConcurrentDottedDict"""
+
+    __slots__ = ()
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError('collections returned by a ConcurrentDottedDict are '
+                        'read-only, use its set_many() to change them')
+
+    __setitem__ = __delitem__ = _set_key = _del_key = _merge = _readonly
+
+    def _child(self, parts, i, action, create=False):
+        # missing nodes would be created in the copy
+        if create:
+            self._readonly()
+        return DottedCollection._child(self, parts, i, action)
+
+    def _wrap(self, value):
+        return _view(value)
+
+
+class _DictView(_View, DottedDict):
+    __slots__ = ()
+
+
+class _ListView(_View, DottedList):
+    __slots__ = ()
+
+    insert = _View._readonly
+
+
+def _view(value):
+    """Wraps a value of a snapshot in a read-only view"""
+    if isinstance(value, list):
+        return _ListView(value, lazy=True, validate=False)
+    if isinstance(value, dict):
+        return _DictView(value, lazy=True, validate=False)
+    return value
+
+
+def _plain(value):
+    """Returns the plain python value of a validated value"""
+    if isinstance(value, DottedCollection):
+        return value.to_python()
+    return value
+
+
+def _step(node, key):
+    """Returns the key of a plain dict or the index of a plain list"""
+    if isinstance(node, list):
+        if not _is_index(key):
+            raise IndexError('cannot use {0} as index in {1}'.format(
+                key, repr(node)))
+        return int(key)
+    if isinstance(node, dict):
+        return key
+    raise KeyError('cannot use "{0}" in {1}'.format(key, repr(node)))
+
+
+def _lookup(root, parts):
+    """Returns the value of a path inside a snapshot"""
+    value = root
+    for key in parts:
+        value = value[_step(value, key)]
+    return value
+
+
+def _copy(node, copies):
+    """Returns a shallow copy of node, unless it was copied by the current
+    write already.
+    """
+    if id(node) in copies or not isinstance(node, (dict, list)):
+        return node
+    node = list(node) if isinstance(node, list) else dict(node)
+    copies.add(id(node))
+    return node
+
+
+def _descend(root, parts, copies, create=True):
+    """Copies the containers on the path to the last key of parts and
+    returns the last one. If create is True missing nodes are created.
+    """
+    node = root
+    for i, key in enumerate(parts[:-1]):
+        key = _step(node, key)
+        if create and (key == len(node) if isinstance(node, list)
+                       else key not in node):
+            child = [] if str(parts[i + 1]).isdigit() else {}
+            copies.add(id(child))
+            if isinstance(node, list):
+                node.append(child)
+            else:
+                node[key] = child
+        else:
+            node[key] = _copy(node[key], copies)
+        node = node[key]
+    return node
+
+
+def _assign(root, parts, value, copies):
+    node = _descend(root, parts, copies)
+    key = _step(node, parts[-1])
+    if isinstance(node, list) and key == len(node):
+        node.append(value)
+    else:
+        node[key] = value
@@ -1,13 +1,36 @@
 # -*- coding: utf-8 -*-
 
 from dotted.collection import DottedCollection
+from dotted.streaming import dump_lines, iter_lines, load
 
 
-def dot(value):
+def dot(value, lazy=False, validate=True):
     """Converts a value into a DottedCollection"""
-    return DottedCollection.factory(value)
+    return DottedCollection.factory(value, lazy=lazy, validate=validate)
 
 
-def dot_json(json_value):
+def dot_json(json_value, lazy=False, validate=True):
     """Creates a DottedCollection from a JSON string"""
-    return DottedCollection.load_json(json_value)
+    return DottedCollection.load_json(json_value, lazy=lazy,
+                                      validate=validate)
+
+
+def dot_json_stream(source, paths=None, lazy=False, validate=True):
+    """Creates a DottedCollection from a JSON file object or iterable of
+    chunks, keeping only the given dotted paths if any.
+    """
+    return load(source, paths=paths, lazy=lazy, validate=validate)
+
+
+def iter_dot_jsonl(source, lazy=False, validate=True):
+    """Yields a DottedCollection for every line of a JSON Lines file object
+    or iterable of chunks, one at a time.
+    """
+    return iter_lines(source, lazy=lazy, validate=validate)
+
+
+def write_dot_jsonl(records, target):
+    """Writes an iterable of DottedCollections to a file object as JSON
+    Lines.
+    """
+    dump_lines(records, target)
@@ -6,11 +6,11 @@ setup(
     author='Carlos Escribano Rey',
     author_email='carlos@nettoys.es',
     url='https://github.com/carlosescri/DottedDict',
-    packages=['dotted', 'dotted.test'],
+    packages=['dotted', 'dotted.benchmarks', 'dotted.test'],
     license=open('LICENSE').read(),
     description='Access dicts and lists with a dotted path notation.',
     long_description=open('README.rst').read(),
-    install_requires=['six'],
+    install_requires=['six', 'futures; python_version < "3"'],
     classifiers=[
         'Development Status :: 4 - Beta',
         'Intended Audience :: Developers',